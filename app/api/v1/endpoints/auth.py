@@ -1,75 +1,106 @@
 from datetime import timedelta
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from jose import JWTError, jwt
+from app.core.auth_cache import UserSnapshot, token_cache
 from app.core.config import settings
 from app.core.database import get_db
-from app.core.security import create_access_token, verify_password
+from app.core.security import aget_password_hash, averify_password, create_access_token
 from app.models.user import User
 from app.schemas.token import Token
 from app.schemas.user import UserCreate, UserResponse
 
 router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/token")
+# For endpoints that also accept the token elsewhere, e.g. EventSource can't set headers
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/token", auto_error=False)
 
 async def get_current_user(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     token: str = Depends(oauth2_scheme)
-) -> User:
+) -> UserSnapshot:
+    return await authenticate_token(db, token)
+
+async def authenticate_token(db: AsyncSession, token: Optional[str], scope: Optional[str] = None) -> UserSnapshot:
+    """
+    Return the user a bearer token belongs to, or raise 401
+    
+    Verified tokens are cached for AUTH_CACHE_TTL seconds, so repeated requests
+    with the same token skip both the JWT check and the user query. With scope,
+    only tokens issued for that scope are accepted, e.g. the short-lived
+    "events" tokens; without it, only access tokens are.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    if not token:
+        raise credentials_exception
+    # Only access tokens are cached, so a hit never skips the scope check
+    cached = token_cache.get(token) if scope is None else None
+    if cached is not None:
+        return cached
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
         email: str = payload.get("sub")
-        if email is None:
+        if email is None or payload.get("scope") != scope:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
     
-    user = db.query(User).filter(User.email == email).first()
-    if user is None:
+    user = await db.scalar(select(User).where(User.email == email))
+    if user is None or user.is_active is False:
         raise credentials_exception
-    return user
+    snapshot = UserSnapshot.from_user(user)
+    if scope is None:
+        token_cache.put(token, snapshot, payload.get("exp"))
+    return snapshot
 
 @router.post("/register", response_model=UserResponse)
 async def register(
     user_in: UserCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Register a new user."""
     # Check if user exists
-    user = db.query(User).filter(User.email == user_in.email).first()
+    user = await db.scalar(select(User).where(User.email == user_in.email))
     if user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
+    # Don't hold a pooled connection while hashing
+    await db.rollback()
     
     user = User(
         email=user_in.email,
         username=user_in.username,
         full_name=user_in.full_name
     )
-    user.set_password(user_in.password)
+    # bcrypt is CPU-bound: hash in the pool so other requests keep being served
+    user.hashed_password = await aget_password_hash(user_in.password)
     
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     
     return user
 
 @router.post("/token", response_model=Token)
 async def login(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     form_data: OAuth2PasswordRequestForm = Depends()
 ):
     """Get access token."""
-    user = db.query(User).filter(User.email == form_data.username).first()
-    if not user or not user.verify_password(form_data.password):
+    user = await db.scalar(select(User).where(User.email == form_data.username))
+    email, hashed_password = (user.email, user.hashed_password) if user else (None, None)
+    # Don't hold a pooled connection while the password is verified
+    await db.rollback()
+    if not user or not await averify_password(form_data.password, hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -78,7 +109,7 @@ async def login(
     
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+        data={"sub": email}, expires_delta=access_token_expires
     )
     
     return {"access_token": access_token, "token_type": "bearer"} 
\ No newline at end of file
@@ -1,50 +1,121 @@
 import os
-from typing import List
-from fastapi import APIRouter, Depends, File, UploadFile, HTTPException, status
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
+import asyncio
+import base64
+import hashlib
+import json
+import shutil
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+from fastapi import APIRouter, Depends, File, Form, Query, Request, Response, UploadFile, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
+from app.core.auth_cache import UserSnapshot
 from app.core.config import settings
-from app.core.database import get_db
+from app.core.database import AsyncSessionLocal, get_db
+from app.core.events import event_hub, publish_document
+from app.core.output_formats import OUTPUT_FORMATS, ensure_export, tables_path
+from app.core.security import create_access_token
 from app.models.document import Document, ProcessingStatus
-from app.models.user import User
-from app.schemas.document import DocumentCreate, DocumentResponse
+from app.schemas.document import DocumentCreate, DocumentResponse, DocumentSummary
+from app.schemas.token import EventsToken
 from app.tasks.document_processing import process_document
-from app.api.v1.endpoints.auth import get_current_user
+from app.api.v1.endpoints.auth import authenticate_token, get_current_user, optional_oauth2_scheme
 import uuid
 import logging
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-def save_upload_file(upload_file: UploadFile) -> str:
-    """Save an uploaded file and return its stored filename."""
+# Every .docx file is a ZIP archive
+DOCX_MAGIC = b"PK\x03\x04"
+
+class UploadTooLargeError(ValueError):
+    """Raised when an upload exceeds MAX_CONTENT_LENGTH."""
+
+async def save_upload_file(upload_file: UploadFile) -> Tuple[str, str, int]:
+    """
+    Stream an uploaded file to disk and return its stored filename, SHA-256 content hash and size.
+    
+    The file is copied in UPLOAD_CHUNK_SIZE pieces with disk writes off the event loop;
+    the size limit, hash and .docx signature are checked in the same pass.
+    """
+    ext = os.path.splitext(upload_file.filename)[1]
+    stored_filename = f"{uuid.uuid4()}{ext}"
+    file_path = os.path.join(settings.UPLOAD_FOLDER, stored_filename)
     try:
-        ext = os.path.splitext(upload_file.filename)[1]
-        stored_filename = f"{uuid.uuid4()}{ext}"
-        file_path = os.path.join(settings.UPLOAD_FOLDER, stored_filename)
-        
         # Ensure upload directory exists
         os.makedirs(settings.UPLOAD_FOLDER, exist_ok=True)
         
-        # Read the file content
-        content = upload_file.file.read()
-        if not content:
-            raise ValueError("File is empty")
+        if upload_file.size is not None and upload_file.size > settings.MAX_CONTENT_LENGTH:
+            raise UploadTooLargeError("File exceeds the maximum upload size")
         
-        # Write the file
-        with open(file_path, "wb") as buffer:
-            buffer.write(content)
+        digest = hashlib.sha256()
+        size = 0
+        buffer = await run_in_threadpool(open, file_path, "wb")
+        try:
+            while chunk := await upload_file.read(settings.UPLOAD_CHUNK_SIZE):
+                if size == 0 and not chunk.startswith(DOCX_MAGIC):
+                    raise ValueError("File is not a valid .docx document")
+                size += len(chunk)
+                if size > settings.MAX_CONTENT_LENGTH:
+                    raise UploadTooLargeError("File exceeds the maximum upload size")
+                digest.update(chunk)
+                await run_in_threadpool(buffer.write, chunk)
+        finally:
+            await run_in_threadpool(buffer.close)
+        
+        if not size:
+            raise ValueError("File is empty")
         
-        return stored_filename
+        return stored_filename, digest.hexdigest(), size
     except Exception as e:
         logger.error(f"Error saving file {upload_file.filename}: {str(e)}")
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        if isinstance(e, ValueError):
+            raise
         raise ValueError(f"Error saving file: {str(e)}")
 
+async def find_converted_duplicate(db: AsyncSession, content_hash: str) -> Optional[Document]:
+    """Find a completed conversion of identical content made by the current pipeline version."""
+    candidates = (await db.scalars(select(Document).where(
+        Document.content_hash == content_hash,
+        Document.pipeline_version == settings.PIPELINE_VERSION,
+        Document.status == ProcessingStatus.COMPLETED
+    ).order_by(Document.id.desc()))).all()
+    for candidate in candidates:
+        if candidate.output_filename and os.path.exists(
+            os.path.join(settings.OUTPUT_FOLDER, candidate.output_filename)
+        ):
+            return candidate
+    return None
+
+def reuse_output(source: Document, stored_filename: str) -> str:
+    """Hard-link (or copy) an existing output for a new document and return the output filename."""
+    output_filename = f"{os.path.splitext(stored_filename)[0]}.xlsx"
+    source_path = os.path.join(settings.OUTPUT_FOLDER, source.output_filename)
+    target_path = os.path.join(settings.OUTPUT_FOLDER, output_filename)
+    link_or_copy(source_path, target_path)
+    # Bring the extracted tables along so other formats can still be exported
+    if os.path.exists(tables_path(source_path)):
+        link_or_copy(tables_path(source_path), tables_path(target_path))
+    return output_filename
+
+def link_or_copy(source_path: str, target_path: str) -> None:
+    try:
+        os.link(source_path, target_path)
+    except OSError:
+        shutil.copyfile(source_path, target_path)
+
 @router.post("/upload", response_model=DocumentResponse)
 async def upload_document(
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    output_format: str = Form("xlsx"),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_user)
 ) -> DocumentResponse:
     """
     Upload a document for processing.
@@ -60,34 +131,56 @@ async def upload_document(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Only .docx files are supported"
         )
+        
+    if output_format not in OUTPUT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported output format. Choose one of: {', '.join(OUTPUT_FORMATS)}"
+        )
     
     stored_filename = None
     try:
         # Save the uploaded file
-        stored_filename = save_upload_file(file)
+        stored_filename, content_hash, file_size = await save_upload_file(file)
         
         # Create document record
         document = Document(
             original_filename=file.filename,
             stored_filename=stored_filename,
             mime_type=file.content_type or "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-            file_size=str(file.size),
+            file_size=str(file_size),
             status=ProcessingStatus.PENDING,
+            content_hash=content_hash,
+            pipeline_version=settings.PIPELINE_VERSION,
+            output_format=output_format,
             user_id=current_user.id
         )
         
+        # Identical content was already converted: reuse its output instead of queuing a task
+        duplicate = await find_converted_duplicate(db, content_hash)
+        if duplicate:
+            document.output_filename = reuse_output(duplicate, stored_filename)
+            document.status = ProcessingStatus.COMPLETED
+        
         db.add(document)
-        db.commit()
-        db.refresh(document)
+        # Defaults are set in Python and kept after commit, so no refresh is needed
+        await db.commit()
+        
+        await run_in_threadpool(publish_document, document)
+        
+        if duplicate:
+            logger.info(f"Document {document.id} reuses the output of document {duplicate.id}")
+            return document
         
         # Start processing task
         try:
-            process_document.delay(document.id)
+            await run_in_threadpool(process_document.delay, document.id)
         except Exception as e:
             logger.error(f"Error queuing document {document.id} for processing: {str(e)}")
             document.status = ProcessingStatus.FAILED
             document.error_message = "Failed to queue document for processing"
-            db.commit()
+            await db.commit()
+            await run_in_threadpool(publish_document, document)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Failed to queue document for processing"
@@ -95,6 +188,11 @@ async def upload_document(
         
         return document
         
+    except UploadTooLargeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(e)
+        )
     except ValueError as e:
         if stored_filename:
             # Clean up file if it was saved
@@ -117,34 +215,123 @@ async def upload_document(
             detail="An error occurred while processing your document"
         )
 
-@router.get("/", response_model=List[DocumentResponse])
-def list_documents(
+def encode_cursor(document: Document) -> str:
+    """Encode the sort key of the last listed document as an opaque ?after= cursor."""
+    key = f"{document.created_at.isoformat()}|{document.id}"
+    return base64.urlsafe_b64encode(key.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        created_at, document_id = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode().split("|")
+        return datetime.fromisoformat(created_at), int(document_id)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+@router.get("/", response_model=List[DocumentSummary])
+async def list_documents(
+    response: Response,
     skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-) -> List[DocumentResponse]:
+    limit: int = Query(100, ge=1, le=1000),
+    after: Optional[str] = None,
+    status_filter: Optional[ProcessingStatus] = Query(None, alias="status"),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_user)
+) -> List[DocumentSummary]:
     """
-    List all documents for the current user.
+    List the current user's documents, oldest first.
+    
+    Pass the X-Next-Cursor header of a full page as ?after= to get the next one;
+    unlike ?skip=, the cost of a page does not grow with how far into the list it is.
+    ?status= only lists documents in that state.
     """
-    documents = db.query(Document).filter(
-        Document.user_id == current_user.id
-    ).offset(skip).limit(limit).all()
+    query = select(Document).options(
+        load_only(*(getattr(Document, field) for field in DocumentSummary.model_fields))
+    ).where(Document.user_id == current_user.id)
+    if status_filter is not None:
+        query = query.where(Document.status == status_filter)
+    if after:
+        query = query.where(tuple_(Document.created_at, Document.id) > tuple_(*decode_cursor(after)))
+    documents = (await db.scalars(
+        query.order_by(Document.created_at, Document.id).offset(skip).limit(limit)
+    )).all()
+    if len(documents) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(documents[-1])
     return documents
 
+@router.post("/events/token", response_model=EventsToken)
+async def create_events_token(
+    current_user: UserSnapshot = Depends(get_current_user)
+):
+    """
+    Issue a short-lived token for opening the event stream.
+    
+    EventSource cannot set headers, so the stream takes its token in the URL,
+    where proxies and access logs record it. This token only opens the stream
+    and expires after EVENTS_TOKEN_EXPIRE_SECONDS; request a new one to reconnect.
+    """
+    expires_in = settings.EVENTS_TOKEN_EXPIRE_SECONDS
+    token = create_access_token(
+        data={"sub": current_user.email, "scope": "events"}, expires_delta=timedelta(seconds=expires_in)
+    )
+    return {"token": token, "expires_in": expires_in}
+
+@router.get("/events")
+async def document_events(
+    request: Request,
+    token: Optional[str] = None,
+    bearer_token: Optional[str] = Depends(optional_oauth2_scheme)
+) -> StreamingResponse:
+    """
+    Stream status changes of the current user's documents as Server-Sent Events.
+    
+    Authenticate with the Authorization header or, since EventSource cannot set
+    headers, with ?token= holding a token from POST /documents/events/token;
+    access tokens are not accepted in the URL. A "ready" event is sent once
+    subscribed; clients should refetch the document list on it, since events
+    missed while disconnected are not replayed.
+    """
+    # Authenticate up front so the stream doesn't hold a DB session open
+    async with AsyncSessionLocal() as db:
+        if bearer_token:
+            user = await authenticate_token(db, bearer_token)
+        else:
+            user = await authenticate_token(db, token, scope="events")
+        user_id = user.id
+
+    async def stream():
+        queue = event_hub.subscribe(user_id)
+        try:
+            yield "retry: 5000\nevent: ready\ndata: {}\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=settings.EVENTS_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    # Comment line to keep proxies from closing an idle stream
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: document\ndata: {json.dumps(event)}\n\n"
+        finally:
+            event_hub.unsubscribe(user_id, queue)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/{document_id}", response_model=DocumentResponse)
-def get_document(
+async def get_document(
     document_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_user)
 ) -> DocumentResponse:
     """
     Get a specific document by ID.
     """
-    document = db.query(Document).filter(
+    document = await db.scalar(select(Document).where(
         Document.id == document_id,
         Document.user_id == current_user.id
-    ).first()
+    ))
     if not document:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -153,18 +340,22 @@ def get_document(
     return document
 
 @router.get("/{document_id}/download")
-def download_document(
+async def download_document(
     document_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    output_format: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_user)
 ):
     """
-    Download the processed Excel file.
+    Download the processed file.
+    
+    The format defaults to the one chosen at upload; xlsx, csv, parquet and arrow
+    are built from the same extracted rows without re-running the LLM.
     """
-    document = db.query(Document).filter(
+    document = await db.scalar(select(Document).where(
         Document.id == document_id,
         Document.user_id == current_user.id
-    ).first()
+    ))
     if not document:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -183,9 +374,25 @@ def download_document(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Output file not found"
         )
-        
+    
+    output_format = output_format or document.output_format or "xlsx"
+    if output_format not in OUTPUT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported output format. Choose one of: {', '.join(OUTPUT_FORMATS)}"
+        )
+    try:
+        # Building a csv/parquet/arrow export is file and CPU work: keep it off the event loop
+        file_path = await run_in_threadpool(ensure_export, file_path, output_format)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    suffix, media_type = OUTPUT_FORMATS[output_format]
     return FileResponse(
         file_path,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        filename=f"{os.path.splitext(document.original_filename)[0]}.xlsx"
+        media_type=media_type,
+        filename=f"{os.path.splitext(document.original_filename)[0]}{suffix}"
     ) 
\ No newline at end of file
@@ -0,0 +1,117 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Set, Tuple
+from prometheus_client import Counter
+from app.core.config import settings
+
+AUTH_CACHE_LOOKUPS = Counter(
+    "auth_token_cache_lookups_total",
+    "Token-to-user cache lookups in get_current_user",
+    ["result"]
+)
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    """The fields of an authenticated user that request handlers need"""
+    id: int
+    email: str
+    username: str
+    is_active: bool
+    is_superuser: bool
+
+    @classmethod
+    def from_user(cls, user) -> "UserSnapshot":
+        return cls(
+            id=user.id,
+            email=user.email,
+            username=user.username,
+            is_active=user.is_active is not False,
+            is_superuser=bool(user.is_superuser)
+        )
+
+class TokenCache:
+    """
+    Bounded TTL/LRU cache of verified bearer tokens and their users
+
+    Keys are hashes of the tokens, so raw tokens are never kept in memory.
+    An entry expires after ttl seconds or when its token does, whichever
+    comes first. invalidate_user() drops every token of a user, e.g. after
+    a password change or deactivation.
+    """
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[float, UserSnapshot]]" = OrderedDict()
+        self._keys_by_email: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token: str) -> Optional[UserSnapshot]:
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                AUTH_CACHE_LOOKUPS.labels(result="hit").inc()
+                return entry[1]
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+        AUTH_CACHE_LOOKUPS.labels(result="miss").inc()
+        return None
+
+    def put(self, token: str, user: UserSnapshot, token_expires_at: Optional[float] = None) -> None:
+        if self.max_entries <= 0:
+            return
+        expires_at = time.time() + self.ttl
+        if token_expires_at is not None:
+            expires_at = min(expires_at, token_expires_at)
+        key = self._key(token)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (expires_at, user)
+            self._keys_by_email.setdefault(user.email, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_user(self, email: str) -> None:
+        with self._lock:
+            for key in list(self._keys_by_email.get(email, ())):
+                self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_email.clear()
+
+    def _remove(self, key: str) -> None:
+        _, user = self._entries.pop(key)
+        keys = self._keys_by_email.get(user.email)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_email[user.email]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        with self._lock:
+            entries = len(self._entries)
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "max_entries": self.max_entries,
+        }
+
+token_cache = TokenCache(settings.AUTH_CACHE_SIZE, settings.AUTH_CACHE_TTL)
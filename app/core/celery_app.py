@@ -1,11 +1,14 @@
 from celery import Celery
 from .config import settings
 
+# Pools that run many tasks in one process while they wait on the LLM
+IO_POOLS = {"threads", "gevent", "eventlet"}
+
 celery_app = Celery(
     "exceller",
     broker=settings.CELERY_BROKER_URL,
     backend=settings.CELERY_RESULT_BACKEND,
-    include=["app.tasks.document_processing"]
+    include=["app.tasks.document_processing", "app.tasks.pipeline"]
 )
 
 celery_app.conf.update(
@@ -17,5 +20,13 @@ celery_app.conf.update(
     task_track_started=True,
     task_time_limit=3600,  # 1 hour max
     worker_prefetch_multiplier=1,
-    worker_max_tasks_per_child=50,
-) 
\ No newline at end of file
+    worker_pool=settings.CELERY_WORKER_POOL,
+)
+
+if settings.CELERY_WORKER_POOL in IO_POOLS:
+    # Tasks are I/O bound, so one process can keep the LLM backend busy
+    celery_app.conf.worker_concurrency = settings.CELERY_WORKER_CONCURRENCY or 16
+else:
+    celery_app.conf.worker_max_tasks_per_child = 50
+    if settings.CELERY_WORKER_CONCURRENCY:
+        celery_app.conf.worker_concurrency = settings.CELERY_WORKER_CONCURRENCY 
\ No newline at end of file
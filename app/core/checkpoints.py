@@ -0,0 +1,68 @@
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Any, Optional
+from app.core.config import settings
+
+class CheckpointStore:
+    """
+    Intermediate artifacts of one document's staged conversion
+
+    Each stage saves its result (extracted text and chunks, chunk analyses,
+    the merged analysis, the rows of each table) as a JSON file under
+    CHECKPOINT_FOLDER/<document_id>. A retried or redelivered stage loads the
+    saved result instead of calling the LLM again.
+    """
+    def __init__(self, document_id: int, root: Optional[str] = None):
+        self.directory = os.path.join(root or settings.CHECKPOINT_FOLDER, str(document_id))
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.json")
+
+    def has(self, name: str) -> bool:
+        return os.path.exists(self.path(name))
+
+    def load(self, name: str) -> Any:
+        with open(self.path(name), encoding="utf-8") as f:
+            return json.load(f)
+
+    def save(self, name: str, value: Any) -> Any:
+        """Write a checkpoint atomically, so a killed worker never leaves a partial file"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(name)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(value, f, ensure_ascii=False, default=str)
+        os.replace(tmp_path, path)
+        return value
+
+    def clear(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    @staticmethod
+    def sweep(max_age: float, root: Optional[str] = None) -> int:
+        """
+        Remove the checkpoints of every document untouched for max_age seconds
+
+        Completed documents clear their own checkpoints; this removes those of
+        documents that failed and were never processed again, along with any
+        written by a stage that finished after its document completed.
+        Returns the number removed.
+        """
+        root = root or settings.CHECKPOINT_FOLDER
+        cutoff = time.time() - max_age
+        removed = 0
+        try:
+            entries = list(os.scandir(root))
+        except FileNotFoundError:
+            return 0
+        for entry in entries:
+            try:
+                if entry.is_dir() and entry.stat().st_mtime < cutoff:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                    removed += 1
+            except FileNotFoundError:
+                continue
+        return removed
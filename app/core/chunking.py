@@ -0,0 +1,82 @@
+import re
+from typing import Callable, List, Optional
+
+TokenCounter = Callable[[str], int]
+
+SENTENCE_PATTERN = re.compile(r'(?<=[.!?;:])\s+')
+
+def estimate_tokens(text: str) -> int:
+    """Fast token estimate: about four characters per token, and never fewer than words"""
+    return max(len(text) // 4, len(text.split())) + 1
+
+def chunk_text(text: str, max_tokens: int, count_tokens: Optional[TokenCounter] = None) -> List[str]:
+    """
+    Split extracted document text into chunks of at most max_tokens
+
+    Lines (paragraphs and flattened table rows) are packed whole. A paragraph
+    larger than the budget is split at sentence and then word boundaries. When a
+    table continues into the next chunk, its first row is repeated there so the
+    values keep their column labels; no other overlap is added.
+    """
+    count_tokens = count_tokens or estimate_tokens
+    chunks: List[str] = []
+    current: List[str] = []
+    used = 0
+    table_header: Optional[str] = None
+    previous_width = 0
+
+    def flush() -> None:
+        nonlocal current, used
+        if current:
+            chunks.append("\n".join(current))
+        current, used = [], 0
+
+    for line in text.split("\n"):
+        if not line.strip():
+            continue
+        width = line.count(" | ")
+        in_table = bool(width) and width == previous_width
+        if width and not in_table:
+            table_header = line
+        previous_width = width
+
+        for piece in _split_oversized(line, max_tokens, count_tokens):
+            size = count_tokens(piece)
+            if current and used + size > max_tokens:
+                flush()
+                if in_table and table_header is not None and table_header != piece:
+                    header_size = count_tokens(table_header)
+                    if header_size + size <= max_tokens:
+                        current.append(table_header)
+                        used = header_size
+            current.append(piece)
+            used += size
+    flush()
+    return chunks or [text]
+
+def _split_oversized(line: str, max_tokens: int, count_tokens: TokenCounter) -> List[str]:
+    if count_tokens(line) <= max_tokens:
+        return [line]
+    pieces: List[str] = []
+    for sentence in SENTENCE_PATTERN.split(line.strip()):
+        if not sentence:
+            continue
+        if count_tokens(sentence) <= max_tokens:
+            pieces.append(sentence)
+            continue
+        words: List[str] = []
+        for word in sentence.split():
+            if words and count_tokens(" ".join(words + [word])) > max_tokens:
+                pieces.append(" ".join(words))
+                words = []
+            words.append(word)
+        if words:
+            pieces.append(" ".join(words))
+    # Re-pack short sentences so a long paragraph does not become many tiny chunks
+    packed: List[str] = []
+    for piece in pieces:
+        if packed and count_tokens(packed[-1] + " " + piece) <= max_tokens:
+            packed[-1] = packed[-1] + " " + piece
+        else:
+            packed.append(piece)
+    return packed
@@ -19,12 +19,49 @@ class Settings(BaseSettings):
         "DATABASE_URL",
         "sqlite:///./app.db"
     )
+    # Used by the API's request path; defaults to DATABASE_URL with an asyncio driver (aiosqlite, asyncpg)
+    ASYNC_DATABASE_URI: str = os.getenv("ASYNC_DATABASE_URL", "")
+    SQLALCHEMY_ECHO: bool = os.getenv("SQLALCHEMY_ECHO", "false").lower() == "true"  # Log every SQL statement
+    # Applied to every new SQLite connection; ignored for other databases
+    SQLITE_JOURNAL_MODE: str = os.getenv("SQLITE_JOURNAL_MODE", "WAL")  # WAL lets readers run alongside the writer
+    SQLITE_SYNCHRONOUS: str = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")  # NORMAL in WAL: an OS crash may drop the last commits, never corrupts
+    SQLITE_BUSY_TIMEOUT_MS: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "30000"))  # Wait this long for the write lock
+    SQLITE_MMAP_SIZE: int = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+    SQLITE_CACHE_SIZE_KB: int = int(os.getenv("SQLITE_CACHE_SIZE_KB", str(64 * 1024)))  # Page cache per connection
     
     # File Processing
     UPLOAD_FOLDER: str = os.path.abspath("uploads")
     OUTPUT_FOLDER: str = os.path.abspath("outputs")
+    CHECKPOINT_FOLDER: str = os.path.abspath(os.getenv("CHECKPOINT_FOLDER", "checkpoints"))  # Staged pipeline artifacts
+    CHECKPOINT_TTL: float = float(os.getenv("CHECKPOINT_TTL", str(24 * 3600)))  # Seconds before abandoned checkpoints are swept
     MAX_CONTENT_LENGTH: int = 16 * 1024 * 1024  # 16MB max file size
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # Bytes read per chunk while streaming uploads to disk
     ALLOWED_EXTENSIONS: set = {"docx"}
+    # Bump when conversion output changes so identical uploads are converted again
+    PIPELINE_VERSION: str = "1"
+    
+    # Local LLM HTTP client
+    LLM_POOL_CONNECTIONS: int = int(os.getenv("LLM_POOL_CONNECTIONS", "4"))
+    LLM_POOL_MAXSIZE: int = int(os.getenv("LLM_POOL_MAXSIZE", "8"))
+    LLM_POOL_BLOCK: bool = os.getenv("LLM_POOL_BLOCK", "false").lower() == "true"
+    LLM_CONNECT_TIMEOUT: float = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+    LLM_READ_TIMEOUT: float = float(os.getenv("LLM_READ_TIMEOUT", "600"))
+    LLM_HEALTH_TTL: float = float(os.getenv("LLM_HEALTH_TTL", "30"))  # Seconds a successful contact skips the startup probe
+    LLM_CONTEXT_TOKENS: int = int(os.getenv("LLM_CONTEXT_TOKENS", "4096"))
+    ANALYSIS_PROMPT_RESERVE_TOKENS: int = int(os.getenv("ANALYSIS_PROMPT_RESERVE_TOKENS", "1536"))  # Prompt template and response
+    LLM_CACHE_ENABLED: bool = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+    LLM_CACHE_PATH: str = os.path.abspath(os.getenv("LLM_CACHE_PATH", "cache/llm_responses.sqlite3"))
+    LLM_CACHE_MAX_BYTES: int = int(os.getenv("LLM_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+    LLM_TYPE: str = os.getenv("LLM_TYPE", "lmstudio")  # ollama, lmstudio or textgen
+    LLM_MODEL: str = os.getenv("LLM_MODEL", "llama3")
+    LLM_STREAMING: bool = os.getenv("LLM_STREAMING", "true").lower() == "true"  # Parse rows while the model generates
+    LLM_STRUCTURED_OUTPUT: bool = os.getenv("LLM_STRUCTURED_OUTPUT", "true").lower() == "true"  # Constrain output to a JSON schema/grammar
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))  # In-flight async requests per backend
+    NATIVE_TABLE_FAST_PATH: bool = os.getenv("NATIVE_TABLE_FAST_PATH", "true").lower() == "true"
+    ANALYSIS_MODE: str = os.getenv("ANALYSIS_MODE", "sequential")  # sequential or map_reduce
+    ANALYSIS_CONSOLIDATE: bool = os.getenv("ANALYSIS_CONSOLIDATE", "false").lower() == "true"
+    EXTRACTION_CONTEXT_CHARS: int = int(os.getenv("EXTRACTION_CONTEXT_CHARS", "6000"))  # Passages sent per table prompt
+    TABLE_EXTRACTION_CONCURRENCY: int = int(os.getenv("TABLE_EXTRACTION_CONCURRENCY", "4"))
     
     # Message Queue Configuration
     RABBITMQ_HOST: str = os.getenv("RABBITMQ_HOST", "localhost")
@@ -42,6 +79,18 @@ class Settings(BaseSettings):
         "CELERY_RESULT_BACKEND",
         f"rpc://{RABBITMQ_USER}:{RABBITMQ_PASS}@{RABBITMQ_HOST}:{RABBITMQ_PORT}/{RABBITMQ_VHOST}"
     )
+    PROCESSING_PIPELINE: str = os.getenv("PROCESSING_PIPELINE", "basic")  # basic or staged (LLM stage tasks)
+    PROGRESS_UPDATE_INTERVAL: float = float(os.getenv("PROGRESS_UPDATE_INTERVAL", "2"))  # Seconds between coalesced progress writes per worker process
+    BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", "12"))  # Each +1 doubles hashing time
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+    PASSWORD_HASH_MAX_PENDING: int = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32"))  # Beyond this, logins get 429
+    AUTH_CACHE_SIZE: int = int(os.getenv("AUTH_CACHE_SIZE", "10000"))  # Verified tokens cached per API process
+    AUTH_CACHE_TTL: float = float(os.getenv("AUTH_CACHE_TTL", "60"))  # Seconds before a token is verified again
+    EVENTS_BACKEND: str = os.getenv("EVENTS_BACKEND", "broker")  # broker (fanout via Celery broker) or local
+    EVENTS_HEARTBEAT_SECONDS: float = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+    EVENTS_TOKEN_EXPIRE_SECONDS: int = int(os.getenv("EVENTS_TOKEN_EXPIRE_SECONDS", "60"))  # Lifetime of ?token= stream tokens
+    CELERY_WORKER_POOL: str = os.getenv("CELERY_WORKER_POOL", "prefork")  # prefork, threads, gevent or eventlet
+    CELERY_WORKER_CONCURRENCY: int = int(os.getenv("CELERY_WORKER_CONCURRENCY", "0"))  # 0 = pool default
     
     # Monitoring
     SENTRY_DSN: Optional[str] = os.getenv("SENTRY_DSN")
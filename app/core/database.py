@@ -1,23 +1,133 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, Session
+import asyncio
+import weakref
+from typing import AsyncIterator, Optional
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
 from .config import settings
 from app.models import Base  # This will import all models
 import app.models  # This ensures all models are loaded
 
+# asyncio drivers for the request path, by database backend
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg", "mysql": "aiomysql"}
+
+def async_database_url() -> URL:
+    """Return ASYNC_DATABASE_URL, or DATABASE_URL with its driver swapped for an asyncio one."""
+    if settings.ASYNC_DATABASE_URI:
+        return make_url(settings.ASYNC_DATABASE_URI)
+    url = make_url(settings.SQLALCHEMY_DATABASE_URI)
+    backend = url.get_backend_name()
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+# Synchronous engine for the Celery workers and startup; the API uses async_engine
 engine = create_engine(
     settings.SQLALCHEMY_DATABASE_URI,
     pool_pre_ping=True,
-    echo=True
+    echo=settings.SQLALCHEMY_ECHO
 )
 
+async_url = async_database_url()
+async_engine = create_async_engine(
+    async_url,
+    # A local SQLite file can't drop the connection; pinging costs a thread hop per checkout
+    pool_pre_ping=async_url.get_backend_name() != "sqlite",
+    echo=settings.SQLALCHEMY_ECHO
+)
+
+# One per event loop; asyncio locks can't be shared between loops
+_sqlite_write_locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = weakref.WeakKeyDictionary()
+
+class SQLiteAsyncSession(AsyncSession):
+    """
+    AsyncSession that makes this process's SQLite writers take turns
+
+    SQLite allows one writer at a time and leaves the others polling in its
+    busy handler, which sleeps up to 100 ms between attempts. The lock is
+    taken before the first flush and held until the transaction ends, so
+    concurrent requests queue on the event loop instead. Writes must go
+    through the unit of work (add/commit); execute() of DML isn't covered.
+    """
+    _write_lock: Optional[asyncio.Lock] = None
+
+    async def flush(self, objects=None) -> None:
+        await self._lock_writes()
+        await super().flush(objects)
+
+    async def commit(self) -> None:
+        try:
+            sync_session = self.sync_session
+            if sync_session.new or sync_session.dirty or sync_session.deleted:
+                await self._lock_writes()
+            await super().commit()
+        finally:
+            self._unlock_writes()
+
+    async def rollback(self) -> None:
+        try:
+            await super().rollback()
+        finally:
+            self._unlock_writes()
+
+    async def close(self) -> None:
+        try:
+            await super().close()
+        finally:
+            self._unlock_writes()
+
+    async def _lock_writes(self) -> None:
+        if self._write_lock is None:
+            lock = _sqlite_write_locks.setdefault(asyncio.get_running_loop(), asyncio.Lock())
+            await lock.acquire()
+            self._write_lock = lock
+
+    def _unlock_writes(self) -> None:
+        if self._write_lock is not None:
+            self._write_lock.release()
+            self._write_lock = None
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Objects stay loaded after commit: lazy loads would need an await the handlers don't make
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    class_=SQLiteAsyncSession if async_engine.dialect.name == "sqlite" else AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
+def configure_sqlite(dbapi_connection, connection_record) -> None:
+    """Tune every SQLite connection for the API and the workers sharing one file."""
+    cursor = dbapi_connection.cursor()
+    # busy_timeout first, so switching to WAL waits out a concurrent writer too
+    cursor.execute(f"PRAGMA busy_timeout = {settings.SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA journal_mode = {settings.SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous = {settings.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA mmap_size = {settings.SQLITE_MMAP_SIZE}")
+    # Negative sizes are in KiB rather than pages
+    cursor.execute(f"PRAGMA cache_size = -{settings.SQLITE_CACHE_SIZE_KB}")
+    cursor.close()
+
+for sqlite_engine in (engine, async_engine.sync_engine):
+    if sqlite_engine.dialect.name == "sqlite":
+        event.listen(sqlite_engine, "connect", configure_sqlite)
 
 def init_db() -> None:
     Base.metadata.create_all(bind=engine)
+    add_missing_columns()
+
+def add_missing_columns() -> None:
+    """Add columns and indexes introduced after a table was first created."""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
 
-def get_db() -> Session:
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close() 
\ No newline at end of file
+async def get_db() -> AsyncIterator[AsyncSession]:
+    async with AsyncSessionLocal() as db:
+        yield db 
\ No newline at end of file
@@ -3,89 +3,526 @@ import docx
 import pandas as pd
 import re
 import argparse
-from openpyxl import Workbook
 import json
+import time
+import asyncio
+import logging
+import threading
+import weakref
+from contextlib import contextmanager
+import httpx
 import requests
-from typing import Dict, List, Any
+from requests.adapters import HTTPAdapter
+from typing import Callable, Dict, List, Any, Optional, Tuple
+from app.core.config import settings
+from app.core.llm_cache import ResponseCache, get_response_cache
+from app.core.excel_writer import WorkbookWriter, write_tables
+from app.core.json_stream import JSONArrayStream, JSONObjectStream
+from app.core.output_formats import save_tables
+from app.core.progress import ProgressCallback, ProgressTracker
+from app.core.chunking import TokenCounter, chunk_text, estimate_tokens
+from app.core.retrieval import PassageIndex, table_query
+from app.core.structured_output import analysis_schema, schema_to_gbnf, table_schema
+from app.core.table_extractor import extract_native_tables
+
+logger = logging.getLogger(__name__)
+
+class LLMBackendError(Exception):
+    """Raised when the LLM backend answers with a temporary error (5xx or 429); worth retrying"""
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
 
 class LocalLLMInterface:
     """Base class for local LLM interfaces"""
-    def generate(self, prompt: str) -> str:
+    api_base: str = ""
+    backend_name: str = "LLM"
+    # Whether generate() accepts a JSON schema to constrain the output
+    supports_structured_output: bool = False
+    context_window: int = settings.LLM_CONTEXT_TOKENS
+    tokenizer: Optional[TokenCounter] = None
+    # Overrides the process-wide cache from get_response_cache() when set
+    response_cache: Optional[ResponseCache] = None
+    # Endpoint listing the served models, for backends whose requests don't name one
+    models_path: Optional[str] = None
+
+    # One pooled keep-alive session per API base, shared by every interface
+    # instance in the process so connections survive across converters.
+    _sessions: Dict[str, requests.Session] = {}
+    _in_flight: Dict[str, int] = {}
+    _peak_in_flight: Dict[str, int] = {}
+    # API base -> monotonic time of the last successful contact with the backend
+    _last_healthy: Dict[str, float] = {}
+    # API base -> moving average of request latency in seconds, for progress ETAs
+    _latency: Dict[str, float] = {}
+    # API base -> (monotonic time, served model listing) for models_path backends
+    _served_models: Dict[str, Tuple[float, str]] = {}
+    _lock = threading.Lock()
+
+    # Async clients and concurrency semaphores are bound to an event loop,
+    # so they are kept per running loop and per API base.
+    _async_backends: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+    def __init__(self, context_window: Optional[int] = None, tokenizer: Optional[TokenCounter] = None):
+        """
+        Args:
+            context_window: Model context size in tokens (defaults to LLM_CONTEXT_TOKENS)
+            tokenizer: Callable returning the token count of a text (defaults to a fast estimate)
+        """
+        if context_window:
+            self.context_window = context_window
+        if tokenizer:
+            self.tokenizer = tokenizer
+
+    def count_tokens(self, text: str) -> int:
+        """Count tokens with the configured tokenizer or the fast estimator"""
+        return (self.tokenizer or estimate_tokens)(text)
+
+    def generate(self, prompt: str, schema: Optional[Dict[str, Any]] = None,
+                 validate: Optional[Callable[[str], bool]] = None) -> str:
+        """
+        Generate text with a blocking request to the backend, constrained to schema if given
+
+        validate, if given, decides whether a response is usable: only usable
+        responses are cached and served from the cache, so retrying a document
+        asks the model again instead of replaying a bad answer.
+        """
+        path, payload = self._generate_request(prompt, schema)
+        cache, key, cached = self._cache_lookup(path, payload, validate)
+        if cached is not None:
+            return cached
+        with self._track_in_flight():
+            response = self._request("POST", path, json=payload)
+        result = self._handle_response(response.status_code, response.text, response.json)
+        self._cache_store(cache, key, result, validate)
+        return result
+
+    async def agenerate(self, prompt: str, schema: Optional[Dict[str, Any]] = None,
+                        validate: Optional[Callable[[str], bool]] = None) -> str:
+        """Generate text without blocking the event loop, bounded by LLM_MAX_CONCURRENCY per backend"""
+        client, semaphore = self._async_backend()
+        if type(self)._generate_request is LocalLLMInterface._generate_request:
+            # Custom interfaces that only implement generate() run in a worker thread
+            async with semaphore:
+                return await asyncio.to_thread(self.generate, prompt)
+        path, payload = self._generate_request(prompt, schema)
+        # The cache is SQLite on disk: keep its I/O off the event loop
+        cache, key, cached = await asyncio.to_thread(self._cache_lookup, path, payload, validate)
+        if cached is not None:
+            return cached
+        async with semaphore:
+            with self._track_in_flight():
+                response = await client.post(f"{self.api_base}{path}", json=payload)
+        result = self._handle_response(response.status_code, response.text, response.json)
+        await asyncio.to_thread(self._cache_store, cache, key, result, validate)
+        return result
+
+    async def astream_generate(self, prompt: str, on_text: Callable[[str], bool],
+                               schema: Optional[Dict[str, Any]] = None,
+                               validate: Optional[Callable[[str], bool]] = None) -> str:
+        """
+        Stream generated text into on_text as the backend produces it
+        
+        on_text receives each fragment and returns True to stop generation early,
+        e.g. once the JSON it waits for is complete. Returns all text received.
+        Backends without a streaming API deliver the whole completion at once.
+        """
+        if type(self)._stream_request is LocalLLMInterface._stream_request:
+            text = await self.agenerate(prompt, schema, validate)
+            on_text(text)
+            return text
+        # Share cache entries with the non-streamed request for the same prompt
+        cache, key, cached = await asyncio.to_thread(self._cache_lookup, *self._generate_request(prompt, schema), validate)
+        if cached is not None:
+            on_text(cached)
+            return cached
+        path, payload = self._stream_request(prompt, schema)
+        client, semaphore = self._async_backend()
+        parts: List[str] = []
+        async with semaphore:
+            with self._track_in_flight():
+                async with client.stream("POST", f"{self.api_base}{path}", json=payload) as response:
+                    if response.status_code != 200:
+                        body = (await response.aread()).decode(errors="replace")
+                        raise self._api_error(response.status_code, body)
+                    async for line in response.aiter_lines():
+                        if not line.strip():
+                            continue
+                        fragment, finished = self._parse_stream_line(line)
+                        stop = False
+                        if fragment:
+                            parts.append(fragment)
+                            stop = on_text(fragment)
+                        if stop or finished:
+                            # Leaving the block closes the connection, which ends generation
+                            break
+        text = "".join(parts)
+        await asyncio.to_thread(self._cache_store, cache, key, text, validate)
+        return text
+
+    def _cache_lookup(self, path: str, payload: Dict[str, Any], validate: Optional[Callable[[str], bool]]
+                      ) -> Tuple[Optional[ResponseCache], Optional[str], Optional[str]]:
+        """Return the cache, the request's key and a usable cached response (all None when not cached)"""
+        cache = self.response_cache or get_response_cache()
+        if not cache:
+            return None, None, None
+        model = self.model_identity()
+        if model is None and self.models_path:
+            # The served model is unknown, so a cached answer could be another model's
+            return None, None, None
+        key = ResponseCache.make_key(self.backend_name, path, payload, api_base=self.api_base, model=model)
+        cached = cache.get(key)
+        if cached is not None and validate and not validate(cached):
+            cached = None
+        return cache, key, cached
+
+    @staticmethod
+    def _cache_store(cache: Optional[ResponseCache], key: Optional[str], result: str,
+                     validate: Optional[Callable[[str], bool]]) -> None:
+        if key and (validate is None or validate(result)):
+            cache.put(key, result)
+
+    def model_identity(self) -> Optional[str]:
+        """
+        Identify the model answering this backend's requests, for cache keys
+
+        Backends whose requests don't name a model are asked which models they
+        serve, and the answer is reused for LLM_HEALTH_TTL seconds. None if unknown.
+        """
+        model = getattr(self, "model", None)
+        if model or not self.models_path:
+            return model
+        with LocalLLMInterface._lock:
+            served = LocalLLMInterface._served_models.get(self.api_base)
+        if served and time.monotonic() - served[0] < settings.LLM_HEALTH_TTL:
+            return served[1]
+        try:
+            response = self._request(
+                "GET", self.models_path, timeout=(settings.LLM_CONNECT_TIMEOUT, settings.LLM_CONNECT_TIMEOUT)
+            )
+        except requests.exceptions.RequestException:
+            return None
+        if response.status_code != 200:
+            return None
+        with LocalLLMInterface._lock:
+            LocalLLMInterface._served_models[self.api_base] = (time.monotonic(), response.text.strip())
+        return response.text.strip()
+
+    def _generate_request(self, prompt: str, schema: Optional[Dict[str, Any]] = None) -> Tuple[str, Dict[str, Any]]:
+        """Return the API path and JSON payload of a generation request"""
+        raise NotImplementedError("Subclasses must implement generate()")
+
+    def _stream_request(self, prompt: str, schema: Optional[Dict[str, Any]] = None) -> Tuple[str, Dict[str, Any]]:
+        """Return the API path and JSON payload of a streamed generation request"""
+        raise NotImplementedError("Backend does not support streaming")
+
+    def _parse_stream_line(self, line: str) -> Tuple[str, bool]:
+        """Return the text fragment in one streamed response line and whether the stream is finished"""
+        raise NotImplementedError("Backend does not support streaming")
+
+    def _parse_generation(self, data: Dict[str, Any]) -> str:
+        """Return the generated text from a decoded API response"""
         raise NotImplementedError("Subclasses must implement generate()")
 
+    def _handle_response(self, status_code: int, text: str, decode) -> str:
+        if status_code == 200:
+            return self._parse_generation(decode())
+        raise self._api_error(status_code, text)
+
+    def _api_error(self, status_code: int, text: str) -> Exception:
+        message = f"{self.backend_name} API error: {status_code} - {text}"
+        # 5xx and 429: the backend is loading a model, overloaded or restarting
+        if status_code >= 500 or status_code == 429:
+            return LLMBackendError(message, status_code)
+        # Other client errors would fail again the same way
+        return Exception(message)
+
+    @property
+    def session(self) -> requests.Session:
+        """Return the shared pooled session for this backend"""
+        with LocalLLMInterface._lock:
+            session = LocalLLMInterface._sessions.get(self.api_base)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=settings.LLM_POOL_CONNECTIONS,
+                    pool_maxsize=settings.LLM_POOL_MAXSIZE,
+                    pool_block=settings.LLM_POOL_BLOCK,
+                    max_retries=0
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                LocalLLMInterface._sessions[self.api_base] = session
+            return session
+
+    def _async_backend(self) -> Tuple[httpx.AsyncClient, asyncio.Semaphore]:
+        """Return the async client and concurrency semaphore for this backend on the running loop"""
+        loop = asyncio.get_running_loop()
+        with LocalLLMInterface._lock:
+            backends = LocalLLMInterface._async_backends.setdefault(loop, {})
+            if self.api_base not in backends:
+                client = httpx.AsyncClient(
+                    timeout=httpx.Timeout(settings.LLM_READ_TIMEOUT, connect=settings.LLM_CONNECT_TIMEOUT),
+                    limits=httpx.Limits(
+                        max_connections=settings.LLM_POOL_MAXSIZE,
+                        max_keepalive_connections=settings.LLM_POOL_MAXSIZE
+                    )
+                )
+                backends[self.api_base] = (client, asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY))
+            return backends[self.api_base]
+
+    @classmethod
+    async def aclose(cls) -> None:
+        """Close the async clients opened on the running loop"""
+        loop = asyncio.get_running_loop()
+        with LocalLLMInterface._lock:
+            backends = LocalLLMInterface._async_backends.pop(loop, {})
+        for client, _ in backends.values():
+            await client.aclose()
+
+    @contextmanager
+    def _track_in_flight(self):
+        with LocalLLMInterface._lock:
+            in_flight = LocalLLMInterface._in_flight.get(self.api_base, 0) + 1
+            LocalLLMInterface._in_flight[self.api_base] = in_flight
+            if in_flight > LocalLLMInterface._peak_in_flight.get(self.api_base, 0):
+                LocalLLMInterface._peak_in_flight[self.api_base] = in_flight
+        started = time.perf_counter()
+        try:
+            yield
+            elapsed = time.perf_counter() - started
+            with LocalLLMInterface._lock:
+                previous = LocalLLMInterface._latency.get(self.api_base)
+                LocalLLMInterface._latency[self.api_base] = \
+                    elapsed if previous is None else 0.7 * previous + 0.3 * elapsed
+        finally:
+            with LocalLLMInterface._lock:
+                LocalLLMInterface._in_flight[self.api_base] -= 1
+
+    def average_latency(self) -> Optional[float]:
+        """Moving average of recent request latency to this backend, None before the first call"""
+        with LocalLLMInterface._lock:
+            return LocalLLMInterface._latency.get(self.api_base)
+
+    def _request(self, method: str, path: str, timeout: Optional[tuple] = None, **kwargs) -> requests.Response:
+        """Send a request through the pooled session with connect/read timeouts"""
+        if timeout is None:
+            timeout = (settings.LLM_CONNECT_TIMEOUT, settings.LLM_READ_TIMEOUT)
+        try:
+            response = self.session.request(method, f"{self.api_base}{path}", timeout=timeout, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            LocalLLMInterface._last_healthy.pop(self.api_base, None)
+            raise
+        LocalLLMInterface._last_healthy[self.api_base] = time.monotonic()
+        return response
+
+    def is_healthy(self) -> bool:
+        """Whether the backend answered within the last LLM_HEALTH_TTL seconds"""
+        last = LocalLLMInterface._last_healthy.get(self.api_base)
+        return last is not None and time.monotonic() - last < settings.LLM_HEALTH_TTL
+
+    def _probe(self, path: str) -> None:
+        """Check that the backend is reachable, skipping the request if it answered recently"""
+        if self.is_healthy():
+            return
+        self._request("GET", path, timeout=(settings.LLM_CONNECT_TIMEOUT, settings.LLM_CONNECT_TIMEOUT))
+
+    def pool_stats(self) -> Dict[str, int]:
+        """Return connection pool usage for this backend, for sizing against worker concurrency"""
+        poolmanager = self.session.get_adapter(self.api_base).poolmanager
+        pools = [poolmanager.pools[key] for key in poolmanager.pools.keys()]
+        with LocalLLMInterface._lock:
+            in_flight = LocalLLMInterface._in_flight.get(self.api_base, 0)
+            peak = LocalLLMInterface._peak_in_flight.get(self.api_base, 0)
+        return {
+            "pool_maxsize": settings.LLM_POOL_MAXSIZE,
+            "connections_opened": sum(pool.num_connections for pool in pools),
+            "requests_sent": sum(pool.num_requests for pool in pools),
+            "idle_connections": sum(
+                sum(1 for conn in list(pool.pool.queue) if conn is not None)
+                for pool in pools if pool.pool is not None
+            ),
+            "in_flight": in_flight,
+            "peak_in_flight": peak,
+        }
+
 class OllamaInterface(LocalLLMInterface):
     """Interface for Ollama LLMs"""
-    def __init__(self, model: str = "llama3"):
+    backend_name = "Ollama"
+    supports_structured_output = True
+
+    def __init__(self, model: str = "llama3", context_window: Optional[int] = None,
+                 tokenizer: Optional[TokenCounter] = None):
+        super().__init__(context_window, tokenizer)
         self.model = model
         self.api_base = "http://localhost:11434/api"
         # Check if Ollama is running
         try:
-            requests.get(f"{self.api_base}/version")
-        except requests.exceptions.ConnectionError:
+            self._probe("/version")
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
             raise ConnectionError("Ollama server not running. Start with 'ollama serve'")
 
-    def generate(self, prompt: str) -> str:
-        """Generate text using Ollama API"""
-        response = requests.post(
-            f"{self.api_base}/generate",
-            json={"model": self.model, "prompt": prompt, "stream": False}
-        )
-        if response.status_code == 200:
-            return response.json().get("response", "")
-        else:
-            raise Exception(f"Ollama API error: {response.status_code} - {response.text}")
+    def _generate_request(self, prompt: str, schema: Optional[Dict[str, Any]] = None) -> Tuple[str, Dict[str, Any]]:
+        """Build a request for the Ollama generate API"""
+        payload = {
+            "model": self.model,
+            "prompt": prompt,
+            "stream": False,
+            "options": {"num_ctx": self.context_window}
+        }
+        if schema:
+            payload["format"] = schema
+        return "/generate", payload
+
+    def _parse_generation(self, data: Dict[str, Any]) -> str:
+        return data.get("response", "")
+
+    def _stream_request(self, prompt: str, schema: Optional[Dict[str, Any]] = None) -> Tuple[str, Dict[str, Any]]:
+        path, payload = self._generate_request(prompt, schema)
+        return path, {**payload, "stream": True}
+
+    def _parse_stream_line(self, line: str) -> Tuple[str, bool]:
+        # Ollama streams one JSON object per line
+        data = json.loads(line)
+        return data.get("response", ""), bool(data.get("done"))
 
 class LMStudioInterface(LocalLLMInterface):
     """Interface for LM Studio"""
-    def __init__(self, port: int = 1234):
+    backend_name = "LM Studio"
+    supports_structured_output = True
+    models_path = "/models"
+
+    def __init__(self, port: int = 1234, context_window: Optional[int] = None,
+                 tokenizer: Optional[TokenCounter] = None):
+        super().__init__(context_window, tokenizer)
         self.api_base = f"http://localhost:{port}/v1"
         # Check if LM Studio is running
         try:
-            requests.get(f"{self.api_base}/models")
-        except requests.exceptions.ConnectionError:
+            self._probe(self.models_path)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
             raise ConnectionError("LM Studio not running. Start LM Studio and enable API server.")
 
-    def generate(self, prompt: str) -> str:
-        """Generate text using LM Studio API"""
-        response = requests.post(
-            f"{self.api_base}/chat/completions",
-            json={
-                "messages": [{"role": "user", "content": prompt}],
-                "temperature": 0.2
+    def _generate_request(self, prompt: str, schema: Optional[Dict[str, Any]] = None) -> Tuple[str, Dict[str, Any]]:
+        """Build a request for the LM Studio chat completions API"""
+        payload = {
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": 0.2
+        }
+        if schema:
+            payload["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {"name": "extraction", "strict": True, "schema": schema}
             }
-        )
-        if response.status_code == 200:
-            return response.json()["choices"][0]["message"]["content"]
-        else:
-            raise Exception(f"LM Studio API error: {response.status_code} - {response.text}")
+        return "/chat/completions", payload
+
+    def _parse_generation(self, data: Dict[str, Any]) -> str:
+        return data["choices"][0]["message"]["content"]
+
+    def _stream_request(self, prompt: str, schema: Optional[Dict[str, Any]] = None) -> Tuple[str, Dict[str, Any]]:
+        path, payload = self._generate_request(prompt, schema)
+        return path, {**payload, "stream": True}
+
+    def _parse_stream_line(self, line: str) -> Tuple[str, bool]:
+        # OpenAI-style server-sent events: "data: {...}" lines ending with "data: [DONE]"
+        if not line.startswith("data:"):
+            return "", False
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            return "", True
+        choice = json.loads(data)["choices"][0]
+        return choice.get("delta", {}).get("content") or "", choice.get("finish_reason") is not None
 
 class TextGenerationWebUIInterface(LocalLLMInterface):
     """Interface for Text Generation Web UI"""
-    def __init__(self, port: int = 5000):
+    backend_name = "Text Generation Web UI"
+    supports_structured_output = True
+    models_path = "/v1/models"
+
+    def __init__(self, port: int = 5000, context_window: Optional[int] = None,
+                 tokenizer: Optional[TokenCounter] = None):
+        super().__init__(context_window, tokenizer)
         self.api_base = f"http://localhost:{port}/api"
         # Check if Text Generation Web UI is running
         try:
-            requests.get(f"{self.api_base}/v1/models")
-        except requests.exceptions.ConnectionError:
+            self._probe(self.models_path)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
             raise ConnectionError("Text Generation Web UI not running. Start the server first.")
 
-    def generate(self, prompt: str) -> str:
-        """Generate text using Text Generation Web UI API"""
-        response = requests.post(
-            f"{self.api_base}/v1/generate",
-            json={
-                "prompt": prompt,
-                "max_new_tokens": 1024,
-                "temperature": 0.2
-            }
-        )
-        if response.status_code == 200:
-            return response.json().get("results", [{}])[0].get("text", "")
+    def _generate_request(self, prompt: str, schema: Optional[Dict[str, Any]] = None) -> Tuple[str, Dict[str, Any]]:
+        """Build a request for the Text Generation Web UI generate API"""
+        payload = {
+            "prompt": prompt,
+            "max_new_tokens": 1024,
+            "temperature": 0.2
+        }
+        if schema:
+            payload["grammar_string"] = schema_to_gbnf(schema)
+        return "/v1/generate", payload
+
+    def _parse_generation(self, data: Dict[str, Any]) -> str:
+        return data.get("results", [{}])[0].get("text", "")
+
+def merge_table_specs(tables: List[Dict[str, Any]], column_overlap: float = 0.6) -> List[Dict[str, Any]]:
+    """
+    Merge table specs found in separate chunks
+    
+    Two specs describe the same table when their names match (ignoring case and
+    spacing) or when their column sets overlap by at least column_overlap (Jaccard).
+    Merged specs keep the first name and the union of columns in first-seen order.
+    """
+    def normalize(value: str) -> str:
+        return re.sub(r'[^a-z0-9]+', ' ', str(value).lower()).strip()
+
+    merged: List[Dict[str, Any]] = []
+    for table in tables:
+        if not table.get('name') or not table.get('columns'):
+            continue
+        name = normalize(table['name'])
+        columns = {normalize(col) for col in table['columns']}
+        for existing in merged:
+            existing_columns = {normalize(col) for col in existing['columns']}
+            overlap = len(columns & existing_columns) / len(columns | existing_columns)
+            if normalize(existing['name']) == name or overlap >= column_overlap:
+                for col in table['columns']:
+                    if normalize(col) not in existing_columns:
+                        existing['columns'].append(col)
+                        existing_columns.add(normalize(col))
+                rules = table.get('extraction_rules', '')
+                if rules and rules not in existing['extraction_rules']:
+                    existing['extraction_rules'] += " " + rules
+                break
         else:
-            raise Exception(f"Text Generation Web UI API error: {response.status_code} - {response.text}")
+            merged.append({
+                "name": table['name'],
+                "columns": list(table['columns']),
+                "extraction_rules": table.get('extraction_rules', '')
+            })
+    return merged
+
+# The JSON object or array embedded in an LLM response
+JSON_OBJECT = r'({[\s\S]*})'
+JSON_ARRAY = r'(\[[\s\S]*\])'
+
+def load_response_json(result: str, pattern: str) -> Any:
+    """Parse the JSON matching pattern in result, or the whole result; raises json.JSONDecodeError"""
+    json_match = re.search(pattern, result)
+    return json.loads(json_match.group(1) if json_match else result)
+
+def is_json_response(pattern: str, kind: type) -> Callable[[str], bool]:
+    """Return a check that a response holds usable JSON of the given kind, for the response cache"""
+    def validate(result: str) -> bool:
+        try:
+            return isinstance(load_response_json(result, pattern), kind)
+        except json.JSONDecodeError:
+            return False
+    return validate
+
+is_analysis_response = is_json_response(JSON_OBJECT, dict)
+is_rows_response = is_json_response(JSON_ARRAY, list)
 
 class WordToExcelConverter:
-    def __init__(self, llm_interface: LocalLLMInterface = None, llm_type: str = "ollama", model: str = "llama3"):
+    def __init__(self, llm_interface: LocalLLMInterface = None, llm_type: str = "ollama", model: str = "llama3",
+                 table_concurrency: Optional[int] = None, native_tables: Optional[bool] = None):
         """
         Initialize the converter with a local LLM interface
         
@@ -93,7 +530,13 @@ class WordToExcelConverter:
             llm_interface: Custom LLM interface (optional)
             llm_type: Type of LLM interface to use if not provided (ollama, lmstudio, textgen)
             model: Model name for Ollama
+            table_concurrency: Maximum tables extracted in parallel (defaults to TABLE_EXTRACTION_CONCURRENCY)
+            native_tables: Convert native Word tables directly instead of asking the LLM
+                           (defaults to NATIVE_TABLE_FAST_PATH)
         """
+        self.table_concurrency = table_concurrency or settings.TABLE_EXTRACTION_CONCURRENCY
+        self.native_tables = settings.NATIVE_TABLE_FAST_PATH if native_tables is None else native_tables
+        self.metrics: Dict[str, Any] = {}
         if llm_interface:
             self.llm = llm_interface
         else:
@@ -106,8 +549,14 @@ class WordToExcelConverter:
             else:
                 raise ValueError(f"Unknown LLM type: {llm_type}")
 
-    def extract_text_from_docx(self, docx_path: str) -> str:
-        """Extract full text from a Word document"""
+    def _structured(self, schema: Dict[str, Any]) -> Dict[str, Any]:
+        """Return generate() kwargs constraining output to schema when the backend supports it"""
+        if settings.LLM_STRUCTURED_OUTPUT and getattr(self.llm, "supports_structured_output", False):
+            return {"schema": schema}
+        return {}
+
+    def extract_text_from_docx(self, docx_path: str, include_tables: bool = True) -> str:
+        """Extract full text from a Word document, or only the text outside its tables"""
         doc = docx.Document(docx_path)
         full_text = []
         
@@ -117,7 +566,7 @@ class WordToExcelConverter:
                 full_text.append(para.text)
             
         # Extract text from tables
-        for table in doc.tables:
+        for table in (doc.tables if include_tables else []):
             for row in table.rows:
                 row_text = []
                 for cell in row.cells:
@@ -127,9 +576,31 @@ class WordToExcelConverter:
                 
         return "\n".join(full_text)
 
+    def extract_native_tables(self, docx_path: str) -> List[Dict[str, Any]]:
+        """Extract the native Word tables of a document as table specs with their rows"""
+        return extract_native_tables(docx.Document(docx_path))
+
     def analyze_content(self, text: str) -> Dict[str, Any]:
         """Use LLM to analyze document content and suggest table structure"""
-        prompt = f"""You are a document analysis expert who specializes in extracting structured data.
+        result = self.llm.generate(self._analysis_prompt(text), validate=is_analysis_response,
+                                   **self._structured(analysis_schema()))
+        return self._parse_analysis(result) or self._fallback_analysis()
+
+    async def aanalyze_content(self, text: str) -> Optional[Dict[str, Any]]:
+        """Analyze one piece of content without blocking the event loop; None if unparseable"""
+        prompt = self._analysis_prompt(text)
+        structured = self._structured(analysis_schema())
+        if not settings.LLM_STREAMING:
+            return self._parse_analysis(await self.llm.agenerate(prompt, validate=is_analysis_response, **structured))
+        # Stop generating as soon as the JSON object is complete
+        parser = JSONObjectStream()
+        result = await self.llm.astream_generate(prompt, parser.feed, validate=is_analysis_response, **structured)
+        if parser.value is not None:
+            return parser.value
+        return self._parse_analysis(result)
+
+    def _analysis_prompt(self, text: str) -> str:
+        return f"""You are a document analysis expert who specializes in extracting structured data.
         
         Analyze this document content and determine how to structure it as spreadsheet data.
         Identify tables, lists, key-value pairs, or any structured data that should be extracted.
@@ -147,76 +618,176 @@ class WordToExcelConverter:
         }}
         
         Document content:
-        {text[:2000]}  # Limiting to first 2000 chars to avoid context window issues
+        {text}
         
         Respond ONLY with the JSON object.
         """
-        
-        result = self.llm.generate(prompt)
-            
+
+    def _parse_analysis(self, result: str) -> Optional[Dict[str, Any]]:
         # Extract JSON from response
         try:
-            # Find JSON structure in the response
-            json_match = re.search(r'({[\s\S]*})', result)
-            if json_match:
-                json_str = json_match.group(1)
-                return json.loads(json_str)
-            else:
-                # If no JSON found, try to parse the entire response
-                return json.loads(result)
+            return load_response_json(result, JSON_OBJECT)
         except json.JSONDecodeError:
             print("Error parsing LLM response. Using fallback method.")
-            # Fallback to simple table extraction
-            return {
-                "tables": [{
-                    "name": "ExtractedData",
-                    "columns": ["Content"],
-                    "extraction_rules": "Extract all content as raw text"
-                }],
-                "analysis": "Could not analyze document structure. Using raw text extraction."
-            }
+            return None
+
+    def _fallback_analysis(self) -> Dict[str, Any]:
+        # Fallback to simple table extraction
+        return {
+            "tables": [{
+                "name": "ExtractedData",
+                "columns": ["Content"],
+                "extraction_rules": "Extract all content as raw text"
+            }],
+            "analysis": "Could not analyze document structure. Using raw text extraction."
+        }
 
     def extract_structured_data(self, text: str, table_spec: Dict[str, Any]) -> List[Dict[str, str]]:
         """Extract structured data based on LLM's analysis"""
-        prompt = f"""You are a data extraction expert who excels at structuring information from documents.
+        result = self.llm.generate(self._extraction_prompt(text, table_spec), validate=is_rows_response,
+                                   **self._structured(table_schema(table_spec['columns'])))
+        return self._parse_extracted_data(result, table_spec)
+
+    async def aextract_structured_data(self, text: str, table_spec: Dict[str, Any],
+                                       on_row: Optional[Callable[[Dict[str, Any]], None]] = None) -> List[Dict[str, str]]:
+        """
+        Extract structured data for one table without blocking the event loop
+        
+        With LLM_STREAMING, rows are parsed while the model generates them and passed
+        to on_row as soon as each object closes; generation stops at the end of the array.
+        """
+        prompt = self._extraction_prompt(text, table_spec)
+        structured = self._structured(table_schema(table_spec['columns']))
+        if settings.LLM_STREAMING:
+            parser = JSONArrayStream()
+            rows: List[Dict[str, Any]] = []
+
+            def on_text(fragment: str) -> bool:
+                for item in parser.feed(fragment):
+                    if isinstance(item, dict):
+                        rows.append(item)
+                        if on_row:
+                            on_row(item)
+                return parser.done
+
+            result = await self.llm.astream_generate(prompt, on_text, validate=is_rows_response, **structured)
+            if rows or parser.done:
+                return rows
+        else:
+            result = await self.llm.agenerate(prompt, validate=is_rows_response, **structured)
+        # Nothing could be parsed incrementally: fall back to parsing the whole response
+        rows = self._parse_extracted_data(result, table_spec)
+        if on_row:
+            for row in rows:
+                on_row(row)
+        return rows
+
+    def extract_tables(self, text: str, table_specs: List[Dict[str, Any]],
+                       on_row: Optional[Callable[[int, Dict[str, Any]], None]] = None,
+                       progress: Optional[ProgressTracker] = None) -> List[List[Dict[str, str]]]:
+        """
+        Extract every table in parallel, returning rows in the order of table_specs
+        
+        on_row(table_index, row) is called for each row as soon as it is parsed;
+        progress is advanced per table and per row.
+        """
+        return asyncio.run(self._aextract_tables(text, table_specs, on_row, progress or ProgressTracker()))
+
+    async def _aextract_tables(self, text: str, table_specs: List[Dict[str, Any]],
+                               on_row: Optional[Callable[[int, Dict[str, Any]], None]],
+                               progress: ProgressTracker) -> List[List[Dict[str, str]]]:
+        semaphore = asyncio.Semaphore(self.table_concurrency)
+        progress.start("extraction", len(table_specs), self.table_concurrency)
+        started = time.perf_counter()
+        self.metrics.update({"time_to_first_row": None, "rows_extracted": 0})
+
+        # Build the passage index once and send each table only its relevant passages
+        index = PassageIndex.from_text(text)
+
+        def row_callback(table_index: int) -> Callable[[Dict[str, Any]], None]:
+            def callback(row: Dict[str, Any]) -> None:
+                if self.metrics["time_to_first_row"] is None:
+                    self.metrics["time_to_first_row"] = time.perf_counter() - started
+                self.metrics["rows_extracted"] += 1
+                if on_row:
+                    on_row(table_index, row)
+                progress.add_rows()
+            return callback
+
+        async def extract(table_index: int, table_spec: Dict[str, Any]) -> List[Dict[str, str]]:
+            context = index.select(table_query(table_spec), settings.EXTRACTION_CONTEXT_CHARS)
+            async with semaphore:
+                rows = await self.aextract_structured_data(context, table_spec, row_callback(table_index))
+            progress.advance()
+            return rows
+
+        try:
+            return await asyncio.gather(*(extract(i, table_spec) for i, table_spec in enumerate(table_specs)))
+        finally:
+            self.metrics["table_extraction_seconds"] = time.perf_counter() - started
+            logger.info(f"Table extraction metrics: {self.metrics}")
+            await LocalLLMInterface.aclose()
+
+    def _extraction_prompt(self, text: str, table_spec: Dict[str, Any]) -> str:
+        return f"""You are a data extraction expert who excels at structuring information from documents.
         
         Extract data from this document according to these instructions:
         Table name: {table_spec['name']}
         Columns: {', '.join(table_spec['columns'])}
         Extraction rules: {table_spec['extraction_rules']}
         
-        Return ONLY a JSON array of objects where keys are column names.
-        Format as: [{{column1: value, column2: value}}, {{column1: value, column2: value}}]
+        Return ONLY a JSON object whose "rows" array holds one object per row, keyed by column name.
+        Format as: {{"rows": [{{"column1": "value", "column2": "value"}}, {{"column1": "value", "column2": "value"}}]}}
         
         Document content:
         {text}
         """
-        
-        result = self.llm.generate(prompt)
-            
+
+    def _parse_extracted_data(self, result: str, table_spec: Dict[str, Any]) -> List[Dict[str, str]]:
         # Extract JSON array from response
         try:
-            # Find JSON structure in the response
-            json_match = re.search(r'(\[[\s\S]*\])', result)
-            if json_match:
-                json_str = json_match.group(1)
-                return json.loads(json_str)
-            else:
-                # If no JSON found, try to parse the entire response
-                return json.loads(result)
+            return load_response_json(result, JSON_ARRAY)
         except json.JSONDecodeError:
             print(f"Error parsing extracted data for {table_spec['name']}. Using fallback.")
             # Return dummy data with column names
             return [{col: f"Error extracting {col}" for col in table_spec['columns']}]
 
-    def chunked_analysis(self, text: str) -> Dict[str, Any]:
-        """Handle large documents by analyzing in chunks"""
-        # Split document into chunks of approximately 2000 characters
-        chunk_size = 2000
-        chunks = [text[i:i+chunk_size] for i in range(0, len(text), chunk_size)]
+    def analysis_chunks(self, text: str) -> List[str]:
+        """Split text into whole paragraphs and table rows that fit one analysis prompt"""
+        budget = max(self.llm.context_window - settings.ANALYSIS_PROMPT_RESERVE_TOKENS, 256)
+        return chunk_text(text, budget, self.llm.count_tokens)
+
+    def chunked_analysis(self, text: str, mode: Optional[str] = None, consolidate: Optional[bool] = None,
+                         progress: Optional[ProgressTracker] = None) -> Dict[str, Any]:
+        """
+        Handle large documents by analyzing in chunks
+        
+        Args:
+            text: Full document text
+            mode: "sequential" refines one analysis chunk by chunk, "map_reduce" analyzes
+                  chunks in parallel and merges the table specs (defaults to ANALYSIS_MODE)
+            consolidate: In map_reduce mode, ask the LLM for a final pass over the merged
+                         tables (defaults to ANALYSIS_CONSOLIDATE)
+            progress: Tracker advanced once per analyzed chunk
+        """
+        mode = mode or settings.ANALYSIS_MODE
+        progress = progress or ProgressTracker()
+        if mode == "map_reduce":
+            if consolidate is None:
+                consolidate = settings.ANALYSIS_CONSOLIDATE
+            return asyncio.run(self._amap_reduce_analysis(text, consolidate, progress))
+        if mode != "sequential":
+            raise ValueError(f"Unknown analysis mode: {mode}")
+        return self._sequential_analysis(text, progress)
+
+    def _sequential_analysis(self, text: str, progress: ProgressTracker) -> Dict[str, Any]:
+        # Split document into chunks that fit the model's context window
+        chunks = self.analysis_chunks(text)
+        progress.start("analysis", len(chunks))
         
         # Analyze first chunk to get initial structure
         analysis = self.analyze_content(chunks[0])
+        progress.advance()
         
         # If document is small enough, return the analysis
         if len(chunks) == 1:
@@ -234,7 +805,8 @@ class WordToExcelConverter:
             """
             
             try:
-                result = self.llm.generate(prompt)
+                result = self.llm.generate(prompt, validate=is_analysis_response,
+                                           **self._structured(analysis_schema()))
                 update = json.loads(re.search(r'({[\s\S]*})', result).group(1))
                 
                 # Merge in any new tables
@@ -249,41 +821,145 @@ class WordToExcelConverter:
             except (json.JSONDecodeError, AttributeError):
                 # If parsing fails, continue with current analysis
                 continue
+            finally:
+                progress.advance()
                 
         return analysis
 
-    def convert_to_excel(self, word_path: str, excel_path: str = None) -> str:
-        """Convert Word document to Excel with structured data"""
-        if not excel_path:
-            excel_path = os.path.splitext(word_path)[0] + '.xlsx'
+    async def _amap_reduce_analysis(self, text: str, consolidate: bool, progress: ProgressTracker) -> Dict[str, Any]:
+        chunks = self.analysis_chunks(text)
+        progress.start("analysis", len(chunks), settings.LLM_MAX_CONCURRENCY)
+        
+        async def analyze(chunk: str) -> Optional[Dict[str, Any]]:
+            result = await self.aanalyze_content(chunk)
+            progress.advance()
+            return result
+        
+        try:
+            # Map: every chunk is analyzed independently
+            results = await asyncio.gather(*(analyze(chunk) for chunk in chunks))
             
-        # Extract text from Word document
-        text = self.extract_text_from_docx(word_path)
+            # Reduce: merge table specs locally
+            analysis = self.merge_analyses(results)
+            
+            if consolidate and sum(1 for result in results if result) > 1:
+                analysis = await self._aconsolidate_analysis(analysis)
+            return analysis
+        finally:
+            await LocalLLMInterface.aclose()
+
+    def merge_analyses(self, results: List[Optional[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Merge the analyses of separately analyzed chunks, skipping unparseable ones"""
+        analyses = [result for result in results if result]
+        if not analyses:
+            return self._fallback_analysis()
+        return {
+            "tables": merge_table_specs([t for a in analyses for t in a.get('tables', [])]),
+            "analysis": " ".join(a.get('analysis', '') for a in analyses if a.get('analysis'))
+        }
+
+    async def _aconsolidate_analysis(self, analysis: Dict[str, Any]) -> Dict[str, Any]:
+        prompt = f"""You analyzed a document in separate parts and found these potential data tables:
+        {json.dumps(analysis['tables'])}
         
-        # Analyze document structure
-        analysis = self.chunked_analysis(text)
+        Some of them may describe the same data under different names or with slightly different columns.
+        Merge duplicates, keep distinct tables separate and keep column names consistent.
         
-        # Create Excel workbook
-        wb = Workbook()
-        wb.remove(wb.active)  # Remove default sheet
+        Return the consolidated analysis as a JSON object with the same structure as before.
+        """
+        update = self._parse_analysis(await self.llm.agenerate(prompt, validate=is_analysis_response,
+                                                               **self._structured(analysis_schema())))
+        if not update or not update.get('tables'):
+            # Keep the local merge if the consolidation pass is unusable
+            return analysis
+        return {"tables": update['tables'], "analysis": update.get('analysis') or analysis['analysis']}
+
+    # Single-step entry points for running the pipeline one stage at a time,
+    # e.g. as separate Celery tasks. Each runs its own event loop.
+
+    def analyze_chunk(self, text: str) -> Optional[Dict[str, Any]]:
+        """Analyze one chunk from synchronous code; None if the response is unparseable"""
+        return self._run(self.aanalyze_content(text))
+
+    def consolidate_analysis(self, analysis: Dict[str, Any]) -> Dict[str, Any]:
+        """Ask the LLM to merge duplicate tables of a merged analysis"""
+        return self._run(self._aconsolidate_analysis(analysis))
+
+    def table_contexts(self, text: str, table_specs: List[Dict[str, Any]]) -> List[str]:
+        """Select the passages of text relevant to each table spec"""
+        index = PassageIndex.from_text(text)
+        return [index.select(table_query(table_spec), settings.EXTRACTION_CONTEXT_CHARS) for table_spec in table_specs]
+
+    def extract_table(self, context: str, table_spec: Dict[str, Any]) -> List[Dict[str, str]]:
+        """Extract the rows of one table from its selected passages"""
+        return self._run(self.aextract_structured_data(context, table_spec))
+
+    def save_workbook(self, excel_path: str, table_specs: List[Dict[str, Any]],
+                      table_data: List[List[Dict[str, Any]]]) -> str:
+        """Write extracted tables to an xlsx file and keep the rows for other output formats"""
+        write_tables(excel_path, [
+            (table_spec['name'], table_spec['columns'], data)
+            for table_spec, data in zip(table_specs, table_data)
+        ])
+        save_tables(excel_path, [
+            {"name": table_spec['name'], "columns": table_spec['columns'], "rows": data}
+            for table_spec, data in zip(table_specs, table_data)
+        ])
+        return excel_path
+
+    def _run(self, coro):
+        async def run():
+            try:
+                return await coro
+            finally:
+                await LocalLLMInterface.aclose()
+        return asyncio.run(run())
+
+    def convert_to_excel(self, word_path: str, excel_path: str = None, analysis_mode: Optional[str] = None,
+                         progress: Optional[ProgressCallback] = None) -> str:
+        """
+        Convert Word document to Excel with structured data
         
-        # Process each table structure
-        for table_spec in analysis['tables']:
-            # Extract data according to table specification
-            data = self.extract_structured_data(text, table_spec)
+        progress, if given, receives a snapshot (stage, completed, total, rows_written,
+        eta_seconds) whenever a chunk is analyzed, a table extracted or a row written.
+        """
+        if not excel_path:
+            excel_path = os.path.splitext(word_path)[0] + '.xlsx'
             
-            # Create worksheet
-            ws = wb.create_sheet(title=table_spec['name'][:31])  # Excel limits sheet names to 31 chars
+        writer = WorkbookWriter()
+        tracker = ProgressTracker(progress, self.llm)
+        
+        # Native Word tables already are a grid, so they skip the LLM entirely
+        native_tables = self.extract_native_tables(word_path) if self.native_tables else []
+        tables = [{k: v for k, v in table_spec.items() if k != 'rows'} for table_spec in native_tables]
+        table_data = [table_spec['rows'] for table_spec in native_tables]
+        for table_spec in native_tables:
+            sheet = writer.add_table(table_spec['name'], table_spec['columns'])
+            for record in table_spec['rows']:
+                writer.append(sheet, record)
+            tracker.add_rows(len(table_spec['rows']))
+        
+        # Text outside the native tables still goes to the LLM; it is skipped only when there is none
+        text = self.extract_text_from_docx(word_path, include_tables=not native_tables)
+        if not native_tables or text.strip():
+            # Analyze document structure
+            analysis = self.chunked_analysis(text, mode=analysis_mode, progress=tracker)
             
-            # Write headers
-            for col, header in enumerate(table_spec['columns'], start=1):
-                ws.cell(row=1, column=col, value=header)
-                
-            # Write data
-            for row, record in enumerate(data, start=2):
-                for col, header in enumerate(table_spec['columns'], start=1):
-                    ws.cell(row=row, column=col, value=record.get(header, ''))
-                    
-        # Save workbook
-        wb.save(excel_path)
-        return excel_path 
\ No newline at end of file
+            # Create every sheet up front, in spec order, then write rows as they stream in
+            sheets = [writer.add_table(table_spec['name'], table_spec['columns']) for table_spec in analysis['tables']]
+            tables += analysis['tables']
+            table_data += self.extract_tables(
+                text, analysis['tables'],
+                on_row=lambda table_index, record: writer.append(sheets[table_index], record),
+                progress=tracker
+            )
+        
+        tracker.start("writing", 0)
+        writer.save(excel_path)
+        
+        # Keep the extracted rows so other output formats never need the LLM again
+        save_tables(excel_path, [
+            {"name": table_spec['name'], "columns": table_spec['columns'], "rows": data}
+            for table_spec, data in zip(tables, table_data)
+        ])
+        return excel_path
\ No newline at end of file
@@ -0,0 +1,126 @@
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional, Set, Tuple
+from kombu import Consumer, Exchange, Queue
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Fanout exchange on the Celery broker: every API process gets every event
+EVENTS_EXCHANGE = Exchange("exceller.events", type="fanout", durable=False)
+
+# Events buffered per stream before the slowest clients start losing them
+SUBSCRIBER_QUEUE_SIZE = 100
+
+def document_event(document) -> Dict[str, Any]:
+    """Serialize a document the way the API returns it, for pushing to clients"""
+    from app.schemas.document import DocumentResponse
+    return DocumentResponse.model_validate(document).model_dump(mode="json")
+
+def publish_document(document) -> None:
+    """Announce a document's current state to its owner's event streams"""
+    publish_event(document_event(document))
+
+def publish_event(event: Dict[str, Any]) -> None:
+    """
+    Publish an event to the streams of every API process
+
+    Delivery is best effort: a broker outage must never fail a conversion,
+    and clients catch up with a full refetch when their stream reconnects.
+    """
+    if settings.EVENTS_BACKEND == "local":
+        event_hub.dispatch(event)
+        return
+    try:
+        from app.core.celery_app import celery_app
+        with celery_app.producer_or_acquire() as producer:
+            producer.publish(
+                event,
+                exchange=EVENTS_EXCHANGE,
+                routing_key="",
+                serializer="json",
+                declare=[EVENTS_EXCHANGE],
+                retry=False
+            )
+    except Exception as e:
+        logger.warning(f"Could not publish document event: {e}")
+
+class EventHub:
+    """
+    Fan out document events to the event streams open in this process
+
+    Streams subscribe per user. With EVENTS_BACKEND=broker a background
+    thread consumes the fanout exchange, starting with the first subscriber;
+    with EVENTS_BACKEND=local only events published in this process are seen.
+    """
+    def __init__(self):
+        self._subscribers: Dict[int, Set[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+        self._lock = threading.Lock()
+        self._listener: Optional[threading.Thread] = None
+
+    def subscribe(self, user_id: int) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add((asyncio.get_running_loop(), queue))
+            if settings.EVENTS_BACKEND != "local" and self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name="document-events", daemon=True)
+                self._listener.start()
+        return queue
+
+    def unsubscribe(self, user_id: int, queue: asyncio.Queue) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(user_id, set())
+            subscribers.difference_update({entry for entry in subscribers if entry[1] is queue})
+            if not subscribers:
+                self._subscribers.pop(user_id, None)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def dispatch(self, event: Dict[str, Any]) -> None:
+        """Hand an event to every stream of its owner; safe to call from any thread"""
+        with self._lock:
+            subscribers = list(self._subscribers.get(event.get("user_id"), ()))
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(self._put, queue, event)
+
+    @staticmethod
+    def _put(queue: asyncio.Queue, event: Dict[str, Any]) -> None:
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            pass
+
+    def _listen(self) -> None:
+        from app.core.celery_app import celery_app
+        queue = Queue(
+            f"exceller.events.{uuid.uuid4().hex}",
+            exchange=EVENTS_EXCHANGE,
+            exclusive=True,
+            auto_delete=True,
+            durable=False
+        )
+
+        def on_message(body, message):
+            message.ack()
+            if isinstance(body, dict):
+                self.dispatch(body)
+
+        while True:
+            try:
+                with celery_app.connection_for_read() as connection:
+                    with Consumer(connection, queues=[queue], callbacks=[on_message], accept=["json"]):
+                        while True:
+                            try:
+                                connection.drain_events(timeout=1)
+                            except TimeoutError:
+                                pass
+            except Exception as e:
+                logger.warning(f"Document event listener disconnected: {e}")
+                time.sleep(5)
+
+event_hub = EventHub()
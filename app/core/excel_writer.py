@@ -0,0 +1,64 @@
+import re
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+from openpyxl import Workbook
+
+# Excel limits sheet names to 31 chars and forbids a few characters
+INVALID_SHEET_CHARS = re.compile(r'[\[\]:*?/\\]')
+MAX_SHEET_NAME = 31
+
+def sheet_title(name: str, used: set) -> str:
+    """Return a valid, unique worksheet title for a table name"""
+    base = INVALID_SHEET_CHARS.sub(" ", str(name)).strip()[:MAX_SHEET_NAME] or "Sheet"
+    title = base
+    counter = 1
+    while title.lower() in used:
+        suffix = f" ({counter})"
+        title = base[:MAX_SHEET_NAME - len(suffix)] + suffix
+        counter += 1
+    used.add(title.lower())
+    return title
+
+class WorkbookWriter:
+    """
+    Incremental xlsx writer on top of openpyxl's write-only mode
+
+    Sheets are created up front in a fixed order and rows can then be appended
+    to any of them as they arrive, e.g. while several tables are still being
+    extracted. Each row is streamed to disk as a whole.
+    """
+    def __init__(self):
+        self.wb = Workbook(write_only=True)
+        self.used: set = set()
+        self.sheets: List[Tuple[Any, Sequence[str]]] = []
+
+    def add_table(self, name: str, columns: Sequence[str]) -> int:
+        """Create a worksheet with a header row and return its index"""
+        ws = self.wb.create_sheet(title=sheet_title(name, self.used))
+        ws.append(list(columns))
+        self.sheets.append((ws, columns))
+        return len(self.sheets) - 1
+
+    def append(self, index: int, record: Dict[str, Any]) -> None:
+        ws, columns = self.sheets[index]
+        ws.append([record.get(column, '') for column in columns])
+
+    def save(self, excel_path: str) -> str:
+        if not self.sheets:
+            # A workbook needs at least one sheet
+            self.wb.create_sheet(title="Sheet")
+        self.wb.save(excel_path)
+        return excel_path
+
+def write_tables(excel_path: str, tables: Iterable[Tuple[str, Sequence[str], Iterable[Dict[str, Any]]]]) -> str:
+    """
+    Write tables to an xlsx file using openpyxl's write-only mode
+
+    Each table is a (name, columns, records) tuple. Rows are streamed to disk
+    as whole rows, so memory stays flat regardless of the number of cells.
+    """
+    writer = WorkbookWriter()
+    for name, columns, records in tables:
+        index = writer.add_table(name, columns)
+        for record in records:
+            writer.append(index, record)
+    return writer.save(excel_path)
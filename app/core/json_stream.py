@@ -0,0 +1,142 @@
+import json
+from typing import Any, List, Optional
+
+WHITESPACE = " \t\r\n"
+
+class JSONArrayStream:
+    """
+    Incrementally parse the first top-level JSON array in streamed LLM output
+
+    Text is fed as it arrives; feed() returns every array element completed by
+    that fragment, so rows can be written before generation finishes. Leading
+    chatter is skipped until a '[' followed by '{' or ']'. Once the closing ']'
+    is seen, done is set and the rest of the output can be discarded.
+    """
+    def __init__(self):
+        self.text = ""
+        self.pos = 0
+        self.started = False
+        self.done = False
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.element_start: Optional[int] = None
+        self.errors = 0
+
+    def feed(self, fragment: str) -> List[Any]:
+        self.text += fragment
+        items: List[Any] = []
+        while self.pos < len(self.text) and not self.done:
+            if not self.started:
+                if not self._find_start():
+                    break
+                continue
+            self._scan(self.text[self.pos], items)
+            self.pos += 1
+        return items
+
+    def _find_start(self) -> bool:
+        start = self.text.find("[", self.pos)
+        if start == -1:
+            self.pos = len(self.text)
+            return False
+        following = start + 1
+        while following < len(self.text) and self.text[following] in WHITESPACE:
+            following += 1
+        if following == len(self.text):
+            # Cannot tell yet whether this bracket opens the data
+            self.pos = start
+            return False
+        if self.text[following] in "{]":
+            self.started = True
+            self.depth = 1
+            self.pos = start + 1
+            return True
+        self.pos = start + 1
+        return True
+
+    def _scan(self, ch: str, items: List[Any]) -> None:
+        if self.in_string:
+            if self.escape:
+                self.escape = False
+            elif ch == "\\":
+                self.escape = True
+            elif ch == '"':
+                self.in_string = False
+            return
+
+        if ch == '"':
+            self.in_string = True
+            self._begin_element()
+        elif ch in "{[":
+            self._begin_element()
+            self.depth += 1
+        elif ch in "}]":
+            self.depth -= 1
+            if self.depth == 0:
+                # Closing bracket of the array itself
+                self._emit(self.pos, items)
+                self.done = True
+            elif self.depth == 1 and self.text[self.element_start] in "{[":
+                self._emit(self.pos + 1, items)
+        elif ch == ",":
+            if self.depth == 1:
+                self._emit(self.pos, items)
+        elif ch not in WHITESPACE:
+            self._begin_element()
+
+    def _begin_element(self) -> None:
+        if self.depth == 1 and self.element_start is None:
+            self.element_start = self.pos
+
+    def _emit(self, end: int, items: List[Any]) -> None:
+        if self.element_start is None:
+            return
+        segment = self.text[self.element_start:end]
+        self.element_start = None
+        try:
+            items.append(json.loads(segment))
+        except json.JSONDecodeError:
+            self.errors += 1
+
+class JSONObjectStream:
+    """Detect when the first top-level JSON object in streamed LLM output is complete"""
+    def __init__(self):
+        self.text = ""
+        self.pos = 0
+        self.start: Optional[int] = None
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.done = False
+        self.value: Optional[Any] = None
+
+    def feed(self, fragment: str) -> bool:
+        self.text += fragment
+        while self.pos < len(self.text) and not self.done:
+            ch = self.text[self.pos]
+            if self.start is None:
+                if ch == "{":
+                    self.start = self.pos
+                    self.depth = 1
+            elif self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch == "{":
+                self.depth += 1
+            elif ch == "}":
+                self.depth -= 1
+                if self.depth == 0:
+                    self.done = True
+                    try:
+                        self.value = json.loads(self.text[self.start:self.pos + 1])
+                    except json.JSONDecodeError:
+                        self.value = None
+            self.pos += 1
+        return self.done
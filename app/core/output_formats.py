@@ -0,0 +1,129 @@
+import csv
+import io
+import json
+import os
+import threading
+import zipfile
+from typing import Any, Dict, List
+from openpyxl import load_workbook
+from app.core.excel_writer import sheet_title
+
+# Format name -> (file suffix, media type). Every format except xlsx is a zip
+# holding one file per table.
+OUTPUT_FORMATS: Dict[str, tuple] = {
+    "xlsx": (".xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "csv": (".csv.zip", "application/zip"),
+    "parquet": (".parquet.zip", "application/zip"),
+    "arrow": (".arrow.zip", "application/zip"),
+}
+
+def tables_path(excel_path: str) -> str:
+    """Return the path of the extracted-table sidecar stored next to an xlsx output"""
+    return os.path.splitext(excel_path)[0] + ".tables.json"
+
+def export_path(excel_path: str, output_format: str) -> str:
+    """Return the path of an xlsx output converted to another format"""
+    return os.path.splitext(excel_path)[0] + OUTPUT_FORMATS[output_format][0]
+
+def save_tables(excel_path: str, tables: List[Dict[str, Any]]) -> str:
+    """
+    Persist extracted tables next to the xlsx output
+
+    Each table is a dict with "name", "columns" and "rows" (records keyed by
+    column). Other output formats are built from this file, so they never need
+    the LLM again.
+    """
+    path = tables_path(excel_path)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(tables, f, ensure_ascii=False, default=str)
+    return path
+
+def load_tables(excel_path: str) -> List[Dict[str, Any]]:
+    """Load the extracted tables of an output, reading the xlsx for outputs without a sidecar"""
+    path = tables_path(excel_path)
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    wb = load_workbook(excel_path, read_only=True)
+    tables = []
+    for ws in wb.worksheets:
+        rows = ws.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            continue
+        columns = ["" if value is None else str(value) for value in header]
+        tables.append({
+            "name": ws.title,
+            "columns": columns,
+            "rows": [dict(zip(columns, values)) for values in rows]
+        })
+    wb.close()
+    return tables
+
+def ensure_export(excel_path: str, output_format: str) -> str:
+    """Return the path of the output in the requested format, building it if needed"""
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format: {output_format}")
+    if output_format == "xlsx":
+        return excel_path
+    path = export_path(excel_path, output_format)
+    if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(excel_path):
+        write_export(path, output_format, load_tables(excel_path))
+    return path
+
+def write_export(path: str, output_format: str, tables: List[Dict[str, Any]]) -> str:
+    """Write tables as a zip with one CSV, Parquet or Arrow IPC file per table"""
+    writers = {"csv": _csv_bytes, "parquet": _parquet_bytes, "arrow": _arrow_bytes}
+    extension = {"csv": ".csv", "parquet": ".parquet", "arrow": ".arrow"}[output_format]
+    used: set = set()
+    # Unique per writer, so concurrent downloads of the same export never share a temp file
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            for table in tables:
+                name = sheet_title(table["name"], used)
+                archive.writestr(name + extension, writers[output_format](table))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+def _csv_bytes(table: Dict[str, Any]) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(table["columns"])
+    for record in table["rows"]:
+        writer.writerow([record.get(column, '') for column in table["columns"]])
+    return buffer.getvalue().encode("utf-8")
+
+def _arrow_table(table: Dict[str, Any]):
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ValueError("Parquet and Arrow output require the pyarrow package")
+    # Extracted values are free text, so every column is stored as a nullable string
+    return pa.table({
+        column: pa.array(
+            [None if record.get(column) is None else str(record.get(column)) for record in table["rows"]],
+            type=pa.string()
+        )
+        for column in table["columns"]
+    })
+
+def _parquet_bytes(table: Dict[str, Any]) -> bytes:
+    arrow_table = _arrow_table(table)
+    import pyarrow.parquet as pq
+    buffer = io.BytesIO()
+    pq.write_table(arrow_table, buffer)
+    return buffer.getvalue()
+
+def _arrow_bytes(table: Dict[str, Any]) -> bytes:
+    arrow_table = _arrow_table(table)
+    import pyarrow as pa
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_file(sink, arrow_table.schema) as writer:
+        writer.write_table(arrow_table)
+    return sink.getvalue().to_pybytes()
@@ -0,0 +1,57 @@
+import math
+from typing import Any, Callable, Dict, Optional
+
+ProgressCallback = Callable[[Dict[str, Any]], None]
+
+class ProgressTracker:
+    """
+    Cumulative progress of one conversion
+
+    The converter advances it as chunks are analyzed, tables extracted and
+    rows written, and every change is passed to the callback as a snapshot:
+    stage, completed, total, rows_written and eta_seconds. The ETA assumes the
+    remaining LLM calls of the stage take the backend's recent average latency,
+    parallelism calls at a time. Without a callback every method is a no-op.
+    """
+    def __init__(self, callback: Optional[ProgressCallback] = None, llm: Any = None):
+        self.callback = callback
+        self.llm = llm
+        self.stage: Optional[str] = None
+        self.completed = 0
+        self.total = 0
+        self.parallelism = 1
+        self.rows_written = 0
+
+    def start(self, stage: str, total: int, parallelism: int = 1, completed: int = 0) -> None:
+        self.stage = stage
+        self.completed = completed
+        self.total = total
+        self.parallelism = max(1, min(parallelism, total or 1))
+        self._emit()
+
+    def advance(self, count: int = 1) -> None:
+        self.completed = min(self.completed + count, self.total)
+        self._emit()
+
+    def add_rows(self, count: int = 1) -> None:
+        self.rows_written += count
+        self._emit()
+
+    def eta_seconds(self) -> Optional[float]:
+        latency = getattr(self.llm, "average_latency", lambda: None)()
+        if latency is None:
+            return None
+        return math.ceil((self.total - self.completed) / self.parallelism) * latency
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "stage": self.stage,
+            "completed": self.completed,
+            "total": self.total,
+            "rows_written": self.rows_written,
+            "eta_seconds": self.eta_seconds(),
+        }
+
+    def _emit(self) -> None:
+        if self.callback:
+            self.callback(self.snapshot())
@@ -0,0 +1,107 @@
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Any
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+class PassageIndex:
+    """
+    In-process BM25 index over the passages of one document
+
+    Passages are the lines produced by text extraction, i.e. paragraphs and
+    flattened table rows. The index is built once per document and queried
+    once per table spec.
+    """
+    def __init__(self, passages: List[str], k1: float = 1.5, b: float = 0.75):
+        self.passages = passages
+        self.k1 = k1
+        self.b = b
+        self.term_counts = [Counter(tokenize(passage)) for passage in passages]
+        self.lengths = [sum(counts.values()) for counts in self.term_counts]
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+
+        document_frequency: Counter = Counter()
+        for counts in self.term_counts:
+            document_frequency.update(counts.keys())
+        total = len(passages)
+        self.idf: Dict[str, float] = {
+            term: math.log(1 + (total - freq + 0.5) / (freq + 0.5))
+            for term, freq in document_frequency.items()
+        }
+
+    @classmethod
+    def from_text(cls, text: str) -> "PassageIndex":
+        return cls([line for line in text.split("\n") if line.strip()])
+
+    def scores(self, query: str) -> List[float]:
+        """Return the BM25 score of every passage for the query"""
+        terms = set(tokenize(query))
+        results = []
+        for counts, length in zip(self.term_counts, self.lengths):
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * length / self.avg_length) if self.avg_length else self.k1
+            for term in terms:
+                freq = counts.get(term)
+                if freq:
+                    score += self.idf[term] * freq * (self.k1 + 1) / (freq + norm)
+            results.append(score)
+        return results
+
+    def blocks(self) -> List[List[int]]:
+        """Group passages into paragraphs and runs of flattened table rows with the same width"""
+        blocks: List[List[int]] = []
+        previous_width = 0
+        for i, passage in enumerate(self.passages):
+            width = passage.count(" | ")
+            if width and width == previous_width:
+                blocks[-1].append(i)
+            else:
+                blocks.append([i])
+            previous_width = width
+        return blocks
+
+    def select(self, query: str, max_chars: int) -> str:
+        """
+        Return the best matching passages for the query, up to max_chars
+
+        A matching table row pulls in the rest of its table, header first, so
+        rows that only hold values are kept with the labels that matched. The
+        result is in document order. If the whole document fits it is returned
+        unchanged; if nothing matches, the leading passages are used.
+        """
+        if sum(len(passage) + 1 for passage in self.passages) <= max_chars:
+            return "\n".join(self.passages)
+
+        scores = self.scores(query)
+        blocks = self.blocks()
+        block_scores = [max(scores[i] for i in block) for block in blocks]
+        if any(block_scores):
+            ranked = sorted(
+                (b for b, score in enumerate(block_scores) if score > 0),
+                key=lambda b: (-block_scores[b], b)
+            )
+        else:
+            ranked = list(range(len(blocks)))
+
+        chosen = []
+        used = 0
+        for b in ranked:
+            for i in blocks[b]:
+                size = len(self.passages[i]) + 1
+                if used + size > max_chars:
+                    break
+                chosen.append(i)
+                used += size
+        return "\n".join(self.passages[i] for i in sorted(chosen))
+
+def table_query(table_spec: Dict[str, Any]) -> str:
+    """Build a retrieval query from a table spec's name, columns and extraction rules"""
+    return " ".join([
+        str(table_spec.get('name', '')),
+        " ".join(str(col) for col in table_spec.get('columns', [])),
+        str(table_spec.get('extraction_rules', ''))
+    ])
@@ -1,10 +1,21 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from .config import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
+
+# bcrypt releases the GIL, so a few threads hash in parallel without blocking the event loop
+_hash_executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+_pending_hashes = 0
+_pending_lock = threading.Lock()
+
+class PasswordHashBusyError(Exception):
+    """Raised when more password hash operations are queued than PASSWORD_HASH_MAX_PENDING."""
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
@@ -20,4 +31,25 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password) 
\ No newline at end of file
+    return pwd_context.hash(password)
+
+async def averify_password(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password in the hashing pool instead of on the event loop"""
+    return await _run_hash(verify_password, plain_password, hashed_password)
+
+async def aget_password_hash(password: str) -> str:
+    """Hash a password in the hashing pool instead of on the event loop"""
+    return await _run_hash(get_password_hash, password)
+
+async def _run_hash(func, *args):
+    # Shed load instead of queueing without bound during a login burst
+    global _pending_hashes
+    with _pending_lock:
+        if _pending_hashes >= settings.PASSWORD_HASH_MAX_PENDING:
+            raise PasswordHashBusyError("Too many login attempts in progress")
+        _pending_hashes += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_executor, func, *args)
+    finally:
+        with _pending_lock:
+            _pending_hashes -= 1
@@ -0,0 +1,86 @@
+import json
+from typing import Any, Dict, List
+
+def table_schema(columns: List[str]) -> Dict[str, Any]:
+    """
+    JSON schema for the rows of one table spec
+
+    Rows are wrapped in an object because OpenAI-style json_schema response
+    formats require an object at the root; the array parsers find the rows inside.
+    """
+    return {
+        "type": "object",
+        "properties": {
+            "rows": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {column: {"type": "string"} for column in columns},
+                    "required": list(columns),
+                    "additionalProperties": False
+                }
+            }
+        },
+        "required": ["rows"],
+        "additionalProperties": False
+    }
+
+def analysis_schema() -> Dict[str, Any]:
+    """JSON schema of the document analysis returned by analyze_content"""
+    return {
+        "type": "object",
+        "properties": {
+            "tables": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "name": {"type": "string"},
+                        "columns": {"type": "array", "items": {"type": "string"}},
+                        "extraction_rules": {"type": "string"}
+                    },
+                    "required": ["name", "columns", "extraction_rules"],
+                    "additionalProperties": False
+                }
+            },
+            "analysis": {"type": "string"}
+        },
+        "required": ["tables", "analysis"],
+        "additionalProperties": False
+    }
+
+GBNF_COMMON = r'''ws ::= [ \t\n]*
+string ::= "\"" ( [^"\\] | "\\" ["\\/bfnrt] | "\\u" [0-9a-fA-F] [0-9a-fA-F] [0-9a-fA-F] [0-9a-fA-F] )* "\"" ws'''
+
+def schema_to_gbnf(schema: Dict[str, Any]) -> str:
+    """
+    Convert a schema built by this module into a GBNF grammar
+
+    Covers the subset used here: objects with fixed, required properties,
+    arrays and strings. Properties are emitted in schema order.
+    """
+    rules: List[str] = []
+
+    def rule(node: Dict[str, Any], name: str) -> str:
+        kind = node.get("type")
+        if kind == "string":
+            return "string"
+        if kind == "array":
+            item = rule(node["items"], f"{name}-item")
+            rules.append(f'{name} ::= "[" ws ( {item} ( "," ws {item} )* )? "]" ws')
+            return name
+        if kind == "object":
+            parts = []
+            for i, (key, child) in enumerate(node.get("properties", {}).items()):
+                value = rule(child, f"{name}-{i}")
+                separator = '"," ws ' if i else ""
+                parts.append(f'{separator}{_literal(json.dumps(key))} ws ":" ws {value}')
+            rules.append(name + ' ::= "{" ws ' + " ".join(parts) + ' "}" ws')
+            return name
+        raise ValueError(f"Unsupported schema type: {kind}")
+
+    root = rule(schema, "value")
+    return "\n".join([f"root ::= ws {root}"] + rules + [GBNF_COMMON])
+
+def _literal(text: str) -> str:
+    return '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
@@ -0,0 +1,132 @@
+import re
+from typing import Dict, List, Any, Optional
+from docx.oxml.ns import qn
+from docx.table import Table, _Cell, _Row
+
+NUMERIC_PATTERN = re.compile(r'^[\s$€£%+\-(),.\d]+$')
+
+def extract_native_tables(doc) -> List[Dict[str, Any]]:
+    """
+    Turn the native tables of a Word document into worksheet specs without an LLM
+
+    Each spec has the same "name", "columns" and "extraction_rules" keys as the
+    LLM analysis, plus the extracted "rows" as dicts keyed by column name.
+    Tables without any data rows are skipped.
+    """
+    specs = []
+    for index, table in enumerate(doc.tables, start=1):
+        spec = table_to_spec(table, f"Table {index}")
+        if spec is not None:
+            specs.append(spec)
+    return specs
+
+def table_to_spec(table: Table, name: str) -> Optional[Dict[str, Any]]:
+    """Convert one python-docx table into a worksheet spec, or None if it holds no data"""
+    rows = [row for row in table.rows if any(cell.text.strip() for cell in row.cells)]
+    if not rows:
+        return None
+
+    width = max(len(row.cells) for row in rows)
+    grid = [_row_values(row, width, fill_spans=False) for row in rows]
+
+    header_count = _count_header_rows(rows, width)
+    if header_count:
+        # Header cells spanning several columns label every column they cover
+        header_grid = [_row_values(row, width, fill_spans=True) for row in rows[:header_count]]
+        columns = _combine_headers(header_grid, width)
+    elif width == 2:
+        # Two-column tables without a header are label/value forms
+        columns = ["Field", "Value"]
+    else:
+        columns = [f"Column {i}" for i in range(1, width + 1)]
+
+    data = [dict(zip(columns, values)) for values in grid[header_count:]]
+    if not data:
+        return None
+
+    return {
+        "name": name,
+        "columns": columns,
+        "extraction_rules": "Native Word table",
+        "rows": data
+    }
+
+def _row_values(row: _Row, width: int, fill_spans: bool) -> List[str]:
+    values = []
+    previous: Optional[_Cell] = None
+    for cell in row.cells:
+        # python-docx repeats a horizontally merged cell for every grid column it spans
+        if previous is not None and cell._tc is previous._tc and not fill_spans:
+            values.append("")
+        else:
+            values.append(cell.text.strip())
+        previous = cell
+    return values + [""] * (width - len(values))
+
+def _count_header_rows(rows: List[_Row], width: int) -> int:
+    # Rows explicitly marked to repeat as header rows
+    count = 0
+    for row in rows:
+        tr_pr = row._tr.trPr
+        if tr_pr is None or tr_pr.find(qn('w:tblHeader')) is None:
+            break
+        count += 1
+    if not count:
+        # Leading rows where every non-empty cell is bold
+        for row in rows:
+            if not _is_bold_row(row):
+                break
+            count += 1
+    if not count and width != 2 and len(rows) > 1 and _looks_like_header(rows[0]):
+        count = 1
+        # A header cell spanning several columns usually sits above a row of sub-headers
+        if len(rows) > 2 and _has_spans(rows[0]) and _looks_like_header(rows[1]):
+            count = 2
+    # Always keep at least one data row
+    return min(count, len(rows) - 1)
+
+def _is_bold_row(row: _Row) -> bool:
+    runs = [
+        run
+        for cell in row.cells
+        for paragraph in cell.paragraphs
+        for run in paragraph.runs
+        if run.text.strip()
+    ]
+    return bool(runs) and all(run.bold for run in runs)
+
+def _distinct_cells(row: _Row) -> List[_Cell]:
+    cells: List[_Cell] = []
+    for cell in row.cells:
+        if not cells or cell._tc is not cells[-1]._tc:
+            cells.append(cell)
+    return cells
+
+def _has_spans(row: _Row) -> bool:
+    return len(_distinct_cells(row)) < len(row.cells)
+
+def _looks_like_header(row: _Row) -> bool:
+    labels = [cell.text.strip() for cell in _distinct_cells(row)]
+    return (
+        all(labels)
+        and len(set(labels)) == len(labels)
+        and not any(NUMERIC_PATTERN.match(label) for label in labels)
+    )
+
+def _combine_headers(header_grid: List[List[str]], width: int) -> List[str]:
+    columns = []
+    seen: Dict[str, int] = {}
+    for col in range(width):
+        parts: List[str] = []
+        for values in header_grid:
+            # Vertically merged header cells repeat their label on every row
+            if values[col] and (not parts or parts[-1] != values[col]):
+                parts.append(values[col])
+        column = " / ".join(parts) or f"Column {col + 1}"
+        if column in seen:
+            seen[column] += 1
+            column = f"{column} ({seen[column]})"
+        else:
+            seen[column] = 1
+        columns.append(column)
+    return columns
@@ -1,12 +1,13 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse
 import sentry_sdk
 from prometheus_fastapi_instrumentator import Instrumentator
 from app.core.config import settings
 from app.api.v1.endpoints import documents, auth
-from app.core.database import init_db
+from app.core.database import async_engine, init_db
+from app.core.security import PasswordHashBusyError
 
 # Initialize Sentry for error tracking
 if settings.SENTRY_DSN:
@@ -31,6 +32,31 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Multipart framing adds a little on top of the file itself
+UPLOAD_OVERHEAD_BYTES = 64 * 1024
+
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    """Reject oversized uploads from Content-Length before the body is read."""
+    if request.method == "POST" and request.url.path == f"{settings.API_V1_STR}/documents/upload":
+        content_length = request.headers.get("content-length")
+        if content_length and content_length.isdigit() and \
+                int(content_length) > settings.MAX_CONTENT_LENGTH + UPLOAD_OVERHEAD_BYTES:
+            return JSONResponse(
+                status_code=413,
+                content={"detail": "File exceeds the maximum upload size"}
+            )
+    return await call_next(request)
+
+@app.exception_handler(PasswordHashBusyError)
+async def password_hash_busy_handler(request: Request, exc: PasswordHashBusyError):
+    """Ask clients to retry when the password hashing pool is saturated."""
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc)},
+        headers={"Retry-After": "1"}
+    )
+
 # Initialize Prometheus metrics
 Instrumentator().instrument(app).expose(app)
 
@@ -55,6 +81,11 @@ async def startup_event():
     """Initialize the database on startup."""
     init_db()
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Close the request path's database connections."""
+    await async_engine.dispose()
+
 @app.get("/")
 async def root():
     """Serve the React frontend."""
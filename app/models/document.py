@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, ForeignKey, Enum as SQLEnum, Integer
+from sqlalchemy import Column, String, ForeignKey, Enum as SQLEnum, Index, Integer, Float
 from sqlalchemy.orm import relationship
 import enum
 from .base import BaseModel
@@ -11,14 +11,28 @@ class ProcessingStatus(enum.Enum):
 
 class Document(BaseModel):
     __tablename__ = "documents"
+    __table_args__ = (
+        # Serves the per-user listing in (created_at, id) order and its keyset cursor
+        Index("ix_documents_user_created", "user_id", "created_at", "id"),
+    )
 
     original_filename = Column(String, nullable=False)
     stored_filename = Column(String, nullable=False, unique=True)
     output_filename = Column(String)
     mime_type = Column(String, nullable=False)
     file_size = Column(String, nullable=False)
-    status = Column(SQLEnum(ProcessingStatus), default=ProcessingStatus.PENDING)
+    status = Column(SQLEnum(ProcessingStatus), default=ProcessingStatus.PENDING, index=True)
     error_message = Column(String)
+    content_hash = Column(String, index=True)
+    pipeline_version = Column(String)
+    output_format = Column(String, default="xlsx")
+    
+    # Progress of the running conversion, written at most every PROGRESS_UPDATE_INTERVAL
+    progress_stage = Column(String)
+    progress_completed = Column(Integer)
+    progress_total = Column(Integer)
+    rows_written = Column(Integer)
+    eta_seconds = Column(Float)
     
     # Relationships
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -1,10 +1,9 @@
-from sqlalchemy import Column, String, Boolean
+from sqlalchemy import Column, String, Boolean, event, inspect
 from sqlalchemy.orm import relationship
-from passlib.context import CryptContext
+from app.core.auth_cache import token_cache
+from app.core.security import get_password_hash, verify_password
 from .base import BaseModel
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 class User(BaseModel):
     __tablename__ = "users"
 
@@ -19,10 +18,23 @@ class User(BaseModel):
     documents = relationship("Document", back_populates="user")
 
     def set_password(self, password: str):
-        self.hashed_password = pwd_context.hash(password)
+        self.hashed_password = get_password_hash(password)
 
     def verify_password(self, password: str) -> bool:
-        return pwd_context.verify(password, self.hashed_password)
+        return verify_password(password, self.hashed_password)
 
     def __repr__(self):
-        return f"<User {self.email}>" 
\ No newline at end of file
+        return f"<User {self.email}>"
+
+@event.listens_for(User, "after_update")
+def invalidate_cached_tokens(mapper, connection, user):
+    # A new password, deactivation or new email must not keep old tokens valid
+    state = inspect(user)
+    changed = [attr for attr in ("hashed_password", "is_active", "email") if state.attrs[attr].history.has_changes()]
+    if changed:
+        for email in set(state.attrs.email.history.deleted or ()) | {user.email}:
+            token_cache.invalidate_user(email)
+
+@event.listens_for(User, "after_delete")
+def invalidate_deleted_user_tokens(mapper, connection, user):
+    token_cache.invalidate_user(user.email) 
\ No newline at end of file
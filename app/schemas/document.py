@@ -15,11 +15,36 @@ class DocumentResponse(DocumentBase):
     id: int
     stored_filename: str
     output_filename: Optional[str] = None
+    output_format: Optional[str] = "xlsx"
     status: ProcessingStatus
     error_message: Optional[str] = None
+    progress_stage: Optional[str] = None
+    progress_completed: Optional[int] = None
+    progress_total: Optional[int] = None
+    rows_written: Optional[int] = None
+    eta_seconds: Optional[float] = None  # Estimated seconds left in the current stage, as of updated_at
     user_id: int
     created_at: datetime
     updated_at: datetime
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True 
+
+class DocumentSummary(BaseModel):
+    """The columns the document list needs; fetch a single document for the rest"""
+    id: int
+    original_filename: str
+    file_size: str
+    output_format: Optional[str] = "xlsx"
+    status: ProcessingStatus
+    error_message: Optional[str] = None
+    progress_stage: Optional[str] = None
+    progress_completed: Optional[int] = None
+    progress_total: Optional[int] = None
+    rows_written: Optional[int] = None
+    eta_seconds: Optional[float] = None
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
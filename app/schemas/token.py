@@ -2,4 +2,8 @@ from pydantic import BaseModel
 
 class Token(BaseModel):
     access_token: str
-    token_type: str 
\ No newline at end of file
+    token_type: str
+
+class EventsToken(BaseModel):
+    token: str
+    expires_in: int 
\ No newline at end of file
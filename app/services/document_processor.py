@@ -1,6 +1,7 @@
 import os
 from typing import Optional
 from app.core.config import settings
+from app.core.progress import ProgressCallback
 from app.utils.word_to_excel import WordToExcelConverter
 import logging
 
@@ -10,13 +11,15 @@ class DocumentProcessor:
     def __init__(self, llm_type: str = "lmstudio", model: str = "llama3"):
         self.converter = WordToExcelConverter(llm_type=llm_type, model=model)
         
-    def process(self, input_path: str, output_path: Optional[str] = None) -> str:
+    def process(self, input_path: str, output_path: Optional[str] = None,
+                progress: Optional[ProgressCallback] = None) -> str:
         """
         Process a Word document and convert it to Excel format.
         
         Args:
             input_path: Path to the input Word document
             output_path: Optional path for the output Excel file
+            progress: Optional callback receiving conversion progress snapshots
             
         Returns:
             str: Path to the generated Excel file
@@ -37,7 +40,7 @@ class DocumentProcessor:
             
             # Convert document
             logger.info(f"Converting document: {input_path} -> {output_path}")
-            self.converter.convert_to_excel(input_path, excel_path=output_path)
+            self.converter.convert_to_excel(input_path, excel_path=output_path, progress=progress)
             
             if not os.path.exists(output_path):
                 raise RuntimeError("Conversion failed: output file not created")
@@ -1,26 +1,64 @@
 import os
+import threading
+from typing import Optional
 from celery import Task
+from celery.signals import worker_process_init
 from app.core.celery_app import celery_app
+from app.core.config import settings
+from app.core.events import publish_document
 from app.core.database import SessionLocal
+from app.core.output_formats import ensure_export
 from app.models.document import Document, ProcessingStatus
 from app.services.document_processor import DocumentProcessor
+from app.tasks.progress import apply_progress, forget_progress, progress_callback
 import logging
 
 logger = logging.getLogger(__name__)
 
+# One processor per worker process, reused by every task it runs. The basic
+# pipeline's converter (app.utils.word_to_excel) makes no LLM calls; LLM clients
+# are reused through the staged pipeline's converter (app.tasks.pipeline).
+_processor: Optional[DocumentProcessor] = None
+_processor_lock = threading.Lock()
+
+def get_processor() -> DocumentProcessor:
+    """Return the worker's document processor, creating it on first use"""
+    global _processor
+    with _processor_lock:
+        if _processor is None:
+            _processor = DocumentProcessor()
+        return _processor
+
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    # Build the converter, and for the staged pipeline its LLM clients, after the fork, once per child
+    try:
+        if settings.PROCESSING_PIPELINE == "staged":
+            from app.tasks.pipeline import get_converter
+            get_converter()
+        else:
+            get_processor()
+    except Exception:
+        # Leave it to the first task to retry and report the failure on the document
+        logger.exception("Could not initialize the document processor")
+
 class DocumentProcessingTask(Task):
-    _db = None
+    # The task object is shared by every task running in the process, so with
+    # the threads, gevent or eventlet pools each execution needs its own session.
+    # threading.local is greenlet-local once gevent/eventlet have patched threading.
+    _local = threading.local()
 
     @property
     def db(self):
-        if self._db is None:
-            self._db = SessionLocal()
-        return self._db
+        if getattr(self._local, "db", None) is None:
+            self._local.db = SessionLocal()
+        return self._local.db
 
     def after_return(self, *args, **kwargs):
-        if self._db is not None:
-            self._db.close()
-            self._db = None
+        db = getattr(self._local, "db", None)
+        if db is not None:
+            db.close()
+            self._local.db = None
 
 @celery_app.task(bind=True, base=DocumentProcessingTask)
 def process_document(self, document_id: int) -> dict:
@@ -33,20 +71,33 @@ def process_document(self, document_id: int) -> dict:
 
         # Update status to processing
         document.status = ProcessingStatus.PROCESSING
+        document.error_message = None
         self.db.commit()
+        publish_document(document)
 
-        # Initialize document processor
-        processor = DocumentProcessor()
-        
-        # Process document
-        output_path = processor.process(
-            input_path=os.path.join("uploads", document.stored_filename)
+        if settings.PROCESSING_PIPELINE == "staged":
+            # Hand the document to the stage tasks, which complete it
+            from app.tasks.pipeline import start_pipeline
+            start_pipeline(document_id)
+            return {"status": "queued", "document_id": document_id}
+
+        # Process document with the worker's shared processor
+        output_path = get_processor().process(
+            input_path=os.path.join("uploads", document.stored_filename),
+            progress=progress_callback(document_id)
         )
+        
+        # Build the format chosen at upload now, so the download is immediate
+        if document.output_format and document.output_format != "xlsx":
+            ensure_export(output_path, document.output_format)
 
         # Update document status
         document.status = ProcessingStatus.COMPLETED
         document.output_filename = os.path.basename(output_path)
+        apply_progress(document, forget_progress(document_id))
+        document.eta_seconds = 0
         self.db.commit()
+        publish_document(document)
 
         return {
             "status": "success",
@@ -58,9 +109,12 @@ def process_document(self, document_id: int) -> dict:
         logger.exception(f"Error processing document {document_id}")
         
         # Update document status to failed
+        self.db.rollback()
         document.status = ProcessingStatus.FAILED
         document.error_message = str(e)
+        apply_progress(document, forget_progress(document_id))
         self.db.commit()
+        publish_document(document)
 
         return {
             "status": "error",
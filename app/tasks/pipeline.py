@@ -0,0 +1,233 @@
+import os
+import threading
+from typing import Any, Dict, List, Optional
+import httpx
+import requests
+from celery import chord
+from app.core.celery_app import celery_app
+from app.core.checkpoints import CheckpointStore
+from app.core.config import settings
+from app.core.events import publish_document
+from app.core.document_processor import LLMBackendError, WordToExcelConverter
+from app.core.output_formats import ensure_export
+from app.core.progress import ProgressTracker
+from app.models.document import Document, ProcessingStatus
+from app.tasks.document_processing import DocumentProcessingTask
+from app.tasks.progress import FINAL_STATUSES, apply_progress, forget_progress, progress_callback
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Errors worth retrying a stage for: the LLM backend was unreachable, timed out
+# or answered with a temporary error; other 4xx responses fail the stage at once
+RETRYABLE_ERRORS = (ConnectionError, requests.exceptions.RequestException, httpx.HTTPError, LLMBackendError)
+
+_converter: Optional[WordToExcelConverter] = None
+_converter_lock = threading.Lock()
+
+def get_converter() -> WordToExcelConverter:
+    """Return the worker's LLM converter, creating it on first use"""
+    global _converter
+    with _converter_lock:
+        if _converter is None:
+            _converter = WordToExcelConverter(llm_type=settings.LLM_TYPE, model=settings.LLM_MODEL)
+        return _converter
+
+class StageTask(DocumentProcessingTask):
+    """
+    Base class of the pipeline stages
+
+    Every stage receives document_id as a keyword argument, so a stage that
+    fails for good marks its document FAILED wherever it runs in the canvas.
+    Stages checkpoint their results, which makes them safe to run again: a
+    message is only acknowledged once its stage has finished, and is requeued
+    if the worker running it dies. A stage redelivered after its document
+    completed returns without doing anything.
+    """
+    autoretry_for = RETRYABLE_ERRORS
+    retry_backoff = True
+    max_retries = 3
+    acks_late = True
+    reject_on_worker_lost = True
+
+    def on_failure(self, exc, task_id, args, kwargs, einfo):
+        document_id = kwargs.get("document_id")
+        if document_id is not None:
+            logger.error(f"Stage {self.name} failed for document {document_id}: {exc}")
+            mark_failed(self.db, document_id, str(exc))
+        super().on_failure(exc, task_id, args, kwargs, einfo)
+
+def mark_failed(db, document_id: int, error: str) -> None:
+    db.rollback()
+    snapshot = forget_progress(document_id)
+    document = db.query(Document).filter(Document.id == document_id).first()
+    # A late failure, e.g. of a redelivered stage, must not undo a finished document
+    if document and document.status not in FINAL_STATUSES:
+        document.status = ProcessingStatus.FAILED
+        document.error_message = error
+        apply_progress(document, snapshot)
+        db.commit()
+        publish_document(document)
+    # Checkpoints are kept, so processing the document again resumes from its
+    # last completed stage; CheckpointStore.sweep removes them if it never is
+
+def is_completed(db, document_id: int) -> bool:
+    """Whether the document was already completed, e.g. before a stage was redelivered"""
+    status = db.query(Document.status).filter(Document.id == document_id).scalar()
+    return status == ProcessingStatus.COMPLETED
+
+def report_stage(document_id: int, stage: str, store: CheckpointStore, prefix: str, total: int) -> None:
+    """Record stage progress, counting the checkpoints every worker has written so far"""
+    # Skip the temp files of checkpoints still being written
+    completed = len([name for name in os.listdir(store.directory)
+                     if name.startswith(prefix) and name.endswith(".json")])
+    tracker = ProgressTracker(progress_callback(document_id), get_converter().llm)
+    # Stages spread over the cluster; assume the backend's concurrency limit is the bottleneck
+    tracker.start(stage, total, settings.LLM_MAX_CONCURRENCY, completed=completed)
+
+def start_pipeline(document_id: int) -> None:
+    """
+    Queue the staged conversion of a document
+
+    extract_text -> chord(analyze_chunk per chunk) -> plan_tables
+    -> chord(extract_table per table) -> assemble_workbook
+
+    Chunks and tables of one document run as separate tasks, so they spread
+    over every worker consuming the queue. Chords need a result backend that
+    stores results (e.g. Redis or a database), not rpc://. Starting the
+    pipeline again for a document, including one that failed, resumes from
+    its last checkpoints. Checkpoints abandoned for CHECKPOINT_TTL are swept first.
+    """
+    CheckpointStore.sweep(settings.CHECKPOINT_TTL)
+    extract_text.delay(document_id=document_id)
+
+@celery_app.task(bind=True, base=StageTask)
+def extract_text(self, document_id: int) -> dict:
+    """Stage 1: read the upload and fan out the analysis of its chunks"""
+    document = self.db.query(Document).filter(Document.id == document_id).first()
+    if not document:
+        raise ValueError(f"Document {document_id} not found")
+    if document.status == ProcessingStatus.COMPLETED:
+        return {"document_id": document_id, "status": "completed"}
+    input_path = os.path.join(settings.UPLOAD_FOLDER, document.stored_filename)
+    converter = get_converter()
+
+    store = CheckpointStore(document_id)
+    if store.has("text"):
+        checkpoint = store.load("text")
+    else:
+        # Native Word tables skip the LLM; assemble_workbook puts them first in the workbook
+        native_tables = converter.extract_native_tables(input_path) if converter.native_tables else []
+        text = converter.extract_text_from_docx(input_path, include_tables=not native_tables)
+        checkpoint = store.save("text", {
+            "text": text,
+            "chunks": converter.analysis_chunks(text) if not native_tables or text.strip() else [],
+            "native_tables": native_tables
+        })
+    chunks = checkpoint["chunks"]
+
+    if not chunks:
+        # Nothing outside the native tables for the LLM to read
+        assemble_workbook.delay([], document_id=document_id, table_specs=[])
+        return {"document_id": document_id, "native_tables": len(checkpoint.get("native_tables", []))}
+
+    if store.has("analysis"):
+        plan_tables.delay(None, document_id=document_id)
+    else:
+        chord(
+            analyze_chunk.s(index, document_id=document_id) for index in range(len(chunks))
+        )(plan_tables.s(document_id=document_id))
+    return {"document_id": document_id, "chunks": len(chunks)}
+
+@celery_app.task(bind=True, base=StageTask)
+def analyze_chunk(self, index: int, document_id: int) -> Optional[Dict[str, Any]]:
+    """Stage 2: analyze one chunk of the document"""
+    if is_completed(self.db, document_id):
+        return None
+    store = CheckpointStore(document_id)
+    name = f"analysis-{index}"
+    if store.has(name):
+        return store.load(name)["value"]
+    chunks = store.load("text")["chunks"]
+    result = store.save(name, {"value": get_converter().analyze_chunk(chunks[index])})["value"]
+    report_stage(document_id, "analysis", store, "analysis-", len(chunks))
+    return result
+
+@celery_app.task(bind=True, base=StageTask)
+def plan_tables(self, analyses: Optional[List[Optional[Dict[str, Any]]]], document_id: int) -> dict:
+    """Stage 3: merge the chunk analyses and fan out the extraction of each table"""
+    if is_completed(self.db, document_id):
+        return {"document_id": document_id, "status": "completed"}
+    converter = get_converter()
+    store = CheckpointStore(document_id)
+    if store.has("analysis"):
+        analysis = store.load("analysis")
+    else:
+        analysis = converter.merge_analyses(analyses)
+        if settings.ANALYSIS_CONSOLIDATE and sum(1 for a in analyses if a) > 1:
+            analysis = converter.consolidate_analysis(analysis)
+        store.save("analysis", analysis)
+
+    table_specs = analysis['tables']
+    contexts = converter.table_contexts(store.load("text")["text"], table_specs)
+    chord(
+        extract_table.s(index, context, table_spec, document_id=document_id)
+        for index, (context, table_spec) in enumerate(zip(contexts, table_specs))
+    )(assemble_workbook.s(document_id=document_id, table_specs=table_specs))
+    return {"document_id": document_id, "tables": len(table_specs)}
+
+@celery_app.task(bind=True, base=StageTask)
+def extract_table(self, index: int, context: str, table_spec: Dict[str, Any], document_id: int) -> List[Dict[str, Any]]:
+    """Stage 4: extract the rows of one table"""
+    if is_completed(self.db, document_id):
+        return []
+    store = CheckpointStore(document_id)
+    name = f"table-{index}"
+    if store.has(name):
+        return store.load(name)
+    rows = store.save(name, get_converter().extract_table(context, table_spec))
+    report_stage(document_id, "extraction", store, "table-", len(store.load("analysis")["tables"]))
+    return rows
+
+@celery_app.task(bind=True, base=StageTask)
+def assemble_workbook(self, table_data: List[List[Dict[str, Any]]], document_id: int,
+                      table_specs: List[Dict[str, Any]]) -> dict:
+    """Stage 5: write the workbook and mark the document completed"""
+    document = self.db.query(Document).filter(Document.id == document_id).first()
+    if not document:
+        raise ValueError(f"Document {document_id} not found")
+    if document.status == ProcessingStatus.COMPLETED:
+        # Redelivered after the workbook was written and the checkpoints cleared
+        return {
+            "status": "success",
+            "document_id": document_id,
+            "output_path": os.path.join(settings.OUTPUT_FOLDER, document.output_filename)
+        }
+
+    store = CheckpointStore(document_id)
+    native_tables = store.load("text").get("native_tables", []) if store.has("text") else []
+    table_specs = [{k: v for k, v in table_spec.items() if k != 'rows'} for table_spec in native_tables] + table_specs
+    table_data = [table_spec['rows'] for table_spec in native_tables] + table_data
+
+    os.makedirs(settings.OUTPUT_FOLDER, exist_ok=True)
+    base_name = os.path.splitext(document.stored_filename)[0]
+    output_path = os.path.join(settings.OUTPUT_FOLDER, f"{base_name}.xlsx")
+    get_converter().save_workbook(output_path, table_specs, table_data)
+    if document.output_format and document.output_format != "xlsx":
+        ensure_export(output_path, document.output_format)
+
+    document.status = ProcessingStatus.COMPLETED
+    document.output_filename = os.path.basename(output_path)
+    apply_progress(document, forget_progress(document_id))
+    document.progress_stage = "writing"
+    document.rows_written = sum(len(rows) for rows in table_data)
+    document.eta_seconds = 0
+    self.db.commit()
+    publish_document(document)
+    # The output and its table sidecar now hold everything the checkpoints did
+    store.clear()
+    return {
+        "status": "success",
+        "document_id": document_id,
+        "output_path": output_path
+    }
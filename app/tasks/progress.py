@@ -0,0 +1,130 @@
+import threading
+from typing import Any, Dict, Optional
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.events import publish_document
+from app.core.progress import ProgressCallback
+from app.models.document import Document, ProcessingStatus
+import logging
+
+logger = logging.getLogger(__name__)
+
+# A document in one of these states has its final progress; later snapshots are stale
+FINAL_STATUSES = (ProcessingStatus.COMPLETED, ProcessingStatus.FAILED)
+
+def progress_values(snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    """Map a progress snapshot to the document columns that store it"""
+    return {
+        "progress_stage": snapshot.get("stage"),
+        "progress_completed": snapshot.get("completed"),
+        "progress_total": snapshot.get("total"),
+        "rows_written": snapshot.get("rows_written"),
+        "eta_seconds": snapshot.get("eta_seconds"),
+    }
+
+def apply_progress(document: Document, snapshot: Optional[Dict[str, Any]]) -> None:
+    """Copy an unwritten snapshot onto a document, so it goes out with the next status commit"""
+    if snapshot:
+        for column, value in progress_values(snapshot).items():
+            setattr(document, column, value)
+
+class ProgressWriter:
+    """
+    Coalesce the progress writes of every conversion running in this process
+
+    The latest snapshot of each document is kept and all of them are written
+    in one transaction, at most once per interval; a snapshot that starts a
+    new stage wakes the writer right away. Every worker process shares one
+    SQLite file with the API, so this trades one write per document for one
+    per process. With an interval of 0 snapshots are written immediately.
+    """
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._pending: Dict[int, Dict[str, Any]] = {}
+        self._stages: Dict[int, Optional[str]] = {}
+        self._urgent = False
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, document_id: int, snapshot: Dict[str, Any]) -> None:
+        with self._condition:
+            self._pending[document_id] = snapshot
+            if self.interval > 0:
+                if self._stages.get(document_id, "") != snapshot.get("stage"):
+                    self._urgent = True
+                    self._condition.notify()
+                if self._thread is None:
+                    # Started lazily, so each prefork child gets its own writer
+                    self._thread = threading.Thread(target=self._run, name="progress-writer", daemon=True)
+                    self._thread.start()
+        if self.interval <= 0:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write every pending snapshot in one transaction and publish the documents"""
+        with self._flush_lock:
+            with self._condition:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return
+            db = SessionLocal()
+            try:
+                for document_id, snapshot in pending.items():
+                    # Another process (e.g. the stage finishing a staged conversion)
+                    # may have completed or failed the document since the snapshot
+                    db.query(Document).filter(
+                        Document.id == document_id, Document.status.notin_(FINAL_STATUSES)
+                    ).update(progress_values(snapshot), synchronize_session=False)
+                db.commit()
+                with self._condition:
+                    for document_id, snapshot in pending.items():
+                        self._stages[document_id] = snapshot.get("stage")
+                for document in db.query(Document).filter(
+                    Document.id.in_(list(pending)), Document.status.notin_(FINAL_STATUSES)
+                ):
+                    publish_document(document)
+            except Exception:
+                # Progress is informational and must never fail a conversion
+                logger.exception(f"Could not record progress of documents {sorted(pending)}")
+                db.rollback()
+            finally:
+                db.close()
+
+    def discard(self, document_id: int) -> Optional[Dict[str, Any]]:
+        """Forget a document and return its unwritten snapshot, if any"""
+        # Waits for an in-flight write, which could otherwise land after the final status
+        with self._flush_lock:
+            with self._condition:
+                self._stages.pop(document_id, None)
+                return self._pending.pop(document_id, None)
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._urgent, timeout=self.interval)
+                self._urgent = False
+            self.flush()
+
+progress_writer = ProgressWriter(settings.PROGRESS_UPDATE_INTERVAL)
+
+def report_progress(document_id: int, snapshot: Dict[str, Any]) -> None:
+    """Queue a progress snapshot for the database and the document's event streams"""
+    progress_writer.submit(document_id, snapshot)
+
+def flush_progress() -> None:
+    """Write the queued snapshots now instead of at the next interval"""
+    progress_writer.flush()
+
+def progress_callback(document_id: int) -> ProgressCallback:
+    """Return a converter progress callback that records progress for a document"""
+    return lambda snapshot: report_progress(document_id, snapshot)
+
+def forget_progress(document_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Stop recording progress of a finished document
+
+    Returns the snapshot that was not written yet; pass it to apply_progress
+    before committing the final status, so both land in one write.
+    """
+    return progress_writer.discard(document_id)
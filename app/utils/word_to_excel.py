@@ -1,6 +1,8 @@
 from docx import Document
-import pandas as pd
 import os
+from app.core.excel_writer import write_tables
+from app.core.output_formats import save_tables
+from app.core.progress import ProgressCallback, ProgressTracker
 
 class WordToExcelConverter:
     def __init__(self, llm_type: str = "lmstudio", model: str = "llama3"):
@@ -14,7 +16,7 @@ class WordToExcelConverter:
         self.llm_type = llm_type
         self.model = model
     
-    def convert_to_excel(self, input_path: str, excel_path: str = None) -> str:
+    def convert_to_excel(self, input_path: str, excel_path: str = None, progress: ProgressCallback = None) -> str:
         """
         Convert a Word document to Excel format.
         
@@ -22,6 +24,7 @@ class WordToExcelConverter:
             input_path (str): Path to the input Word document
             excel_path (str, optional): Path for the output Excel file. If not provided,
                                       will use the input path with .xlsx extension
+            progress (callable, optional): Receives progress snapshots (stage, rows_written, ...)
         
         Returns:
             str: Path to the generated Excel file
@@ -41,10 +44,12 @@ class WordToExcelConverter:
                     'style': para.style.name
                 })
         
-        # Convert to DataFrame
-        df = pd.DataFrame(data)
-        
-        # Save to Excel
-        df.to_excel(excel_path, index=False)
+        # Stream rows into a write-only workbook
+        tracker = ProgressTracker(progress)
+        tracker.start('writing', 0)
+        columns = ['content', 'style'] if data else []
+        write_tables(excel_path, [('Sheet1', columns, data)])
+        save_tables(excel_path, [{'name': 'Sheet1', 'columns': columns, 'rows': data}])
+        tracker.add_rows(len(data))
         
         return excel_path 
\ No newline at end of file
@@ -8,14 +8,26 @@ def main():
     parser.add_argument("--excel_path", type=str, help="Path to save the converted Excel file", default=None)
     parser.add_argument("--llm_type", type=str, choices=["ollama", "lmstudio", "textgen"], default="ollama", help="LLM interface to use")
     parser.add_argument("--model", type=str, default="llama3", help="Model name to use with Ollama interface")
+    parser.add_argument("--analysis_mode", type=str, choices=["sequential", "map_reduce"], default=None, help="How large documents are analyzed chunk by chunk")
+    parser.add_argument("--no_native_tables", action="store_true", help="Send native Word tables through the LLM instead of converting them directly")
+    parser.add_argument("--table_concurrency", type=int, default=None, help="Maximum number of tables extracted in parallel")
     
     args = parser.parse_args()
     
     # Initialize the WordToExcelConverter with specified LLM interface
-    converter = WordToExcelConverter(llm_type=args.llm_type, model=args.model)
+    converter = WordToExcelConverter(
+        llm_type=args.llm_type,
+        model=args.model,
+        table_concurrency=args.table_concurrency,
+        native_tables=False if args.no_native_tables else None
+    )
     
     # Convert the Word document to Excel
-    excel_file = converter.convert_to_excel(args.word_path, excel_path=args.excel_path)
+    excel_file = converter.convert_to_excel(
+        args.word_path,
+        excel_path=args.excel_path,
+        analysis_mode=args.analysis_mode
+    )
     
     print(f"Conversion complete. Excel file saved to: {excel_file}")
 
@@ -1,5 +1,5 @@
 import axios from 'axios';
-import { Document } from '../types';
+import { Document, DocumentSummary } from '../types';
 
 const API_URL = '/api/v1';
 
@@ -20,11 +20,78 @@ export const uploadDocument = async (file: File): Promise<Document> => {
   return response.data;
 };
 
-export const fetchDocuments = async (): Promise<Document[]> => {
-  const response = await axios.get<Document[]>(`${API_URL}/documents`);
+export const fetchDocuments = async (): Promise<DocumentSummary[]> => {
+  const response = await axios.get<DocumentSummary[]>(`${API_URL}/documents`);
   return response.data;
 };
 
+// The JWT saved by the login page
+const authHeaders = (): Record<string, string> => {
+  const token = localStorage.getItem('accessToken');
+  return token ? { Authorization: `Bearer ${token}` } : {};
+};
+
+// EventSource can't send headers, and URLs end up in access logs, so the
+// stream is opened with a short-lived token that only grants the stream
+const createEventsToken = async (): Promise<string> => {
+  const response = await axios.post<{ token: string }>(
+    `${API_URL}/documents/events/token`,
+    null,
+    { headers: authHeaders() }
+  );
+  return response.data.token;
+};
+
+const EVENTS_RETRY_MS = 5000;
+
+export const subscribeToDocumentEvents = (
+  onDocument: (document: Document) => void,
+  onReady: () => void
+): (() => void) => {
+  let source: EventSource | null = null;
+  let retry: ReturnType<typeof setTimeout> | undefined;
+  let closed = false;
+
+  const reconnect = () => {
+    if (!closed) retry = setTimeout(connect, EVENTS_RETRY_MS);
+  };
+
+  const connect = async () => {
+    let token: string;
+    try {
+      token = await createEventsToken();
+    } catch {
+      reconnect();
+      return;
+    }
+    if (closed) return;
+    source = new EventSource(
+      `${API_URL}/documents/events?token=${encodeURIComponent(token)}`
+    );
+    // The server sends "ready" on every (re)connect; events missed while
+    // disconnected are not replayed, so callers refetch on it.
+    source.addEventListener('ready', () => onReady());
+    source.addEventListener('document', (event) => {
+      onDocument(JSON.parse((event as MessageEvent).data) as Document);
+    });
+    source.onerror = () => {
+      // The browser reconnects dropped streams by itself; once the token has
+      // expired the reconnect is refused and the source closes, so get a new one
+      if (source?.readyState === EventSource.CLOSED) {
+        source = null;
+        reconnect();
+      }
+    };
+  };
+
+  connect();
+  return () => {
+    closed = true;
+    clearTimeout(retry);
+    source?.close();
+  };
+};
+
 export const downloadDocument = async (documentId: number): Promise<void> => {
   const response = await axios.get(`${API_URL}/documents/${documentId}/download`, {
     responseType: 'blob',
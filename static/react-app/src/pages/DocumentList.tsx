@@ -1,4 +1,4 @@
-import React from 'react';
+import React, { useEffect } from 'react';
 import {
   Box,
   VStack,
@@ -19,9 +19,13 @@ import {
   Button,
 } from '@chakra-ui/react';
 import { FiDownload, FiRefreshCw } from 'react-icons/fi';
-import { useQuery } from '@tanstack/react-query';
-import { fetchDocuments, downloadDocument } from '../api/documents';
-import { ProcessingStatus } from '../types';
+import { useQuery, useQueryClient } from '@tanstack/react-query';
+import {
+  fetchDocuments,
+  downloadDocument,
+  subscribeToDocumentEvents,
+} from '../api/documents';
+import { DocumentSummary, ProcessingStatus } from '../types';
 
 const statusColors = {
   [ProcessingStatus.PENDING]: 'yellow',
@@ -31,6 +35,7 @@ const statusColors = {
 };
 
 const DocumentList = () => {
+  const queryClient = useQueryClient();
   const {
     data: documents,
     isLoading,
@@ -40,21 +45,25 @@ const DocumentList = () => {
   } = useQuery({
     queryKey: ['documents'],
     queryFn: fetchDocuments,
-    refetchInterval: (data) => {
-      // Refetch every 5 seconds if there are pending or processing documents
-      if (
-        data?.some((doc) =>
-          [ProcessingStatus.PENDING, ProcessingStatus.PROCESSING].includes(
-            doc.status
-          )
-        )
-      ) {
-        return 5000;
-      }
-      return false;
-    },
   });
 
+  // Status changes are pushed by the server instead of polled
+  useEffect(
+    () =>
+      subscribeToDocumentEvents(
+        (updated) =>
+          queryClient.setQueryData<DocumentSummary[]>(['documents'], (current) => {
+            if (!current) return current;
+            const exists = current.some((doc) => doc.id === updated.id);
+            return exists
+              ? current.map((doc) => (doc.id === updated.id ? updated : doc))
+              : [...current, updated];
+          }),
+        () => queryClient.invalidateQueries({ queryKey: ['documents'] })
+      ),
+    [queryClient]
+  );
+
   const handleDownload = async (documentId: number) => {
     try {
       await downloadDocument(documentId);
@@ -146,6 +155,18 @@ const DocumentList = () => {
                       <Badge colorScheme={statusColors[doc.status]}>
                         {doc.status}
                       </Badge>
+                      {doc.status === ProcessingStatus.PROCESSING &&
+                        doc.progress_stage && (
+                          <Text fontSize="xs" color="gray.500" mt={1}>
+                            {doc.progress_stage}
+                            {doc.progress_total
+                              ? ` ${doc.progress_completed}/${doc.progress_total}`
+                              : ''}
+                            {doc.eta_seconds != null
+                              ? ` · ~${Math.ceil(doc.eta_seconds)}s left`
+                              : ''}
+                          </Text>
+                        )}
                     </Td>
                     <Td>{doc.file_size}</Td>
                     <Td>
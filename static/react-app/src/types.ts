@@ -14,6 +14,28 @@ export interface Document {
   file_size: string;
   status: ProcessingStatus;
   error_message: string | null;
+  progress_stage: string | null;
+  progress_completed: number | null;
+  progress_total: number | null;
+  rows_written: number | null;
+  eta_seconds: number | null;
   created_at: string;
   updated_at: string;
-} 
\ No newline at end of file
+} 
+
+// The projection returned by the document list
+export type DocumentSummary = Pick<
+  Document,
+  | 'id'
+  | 'original_filename'
+  | 'file_size'
+  | 'status'
+  | 'error_message'
+  | 'progress_stage'
+  | 'progress_completed'
+  | 'progress_total'
+  | 'rows_written'
+  | 'eta_seconds'
+  | 'created_at'
+  | 'updated_at'
+>;